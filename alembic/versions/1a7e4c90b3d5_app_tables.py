@@ -0,0 +1,68 @@
+"""app tables
+
+Revision ID: 1a7e4c90b3d5
+Revises: 2bc75cfe65ae
+Create Date: 2026-10-18 09:05:17.204551
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1a7e4c90b3d5'
+down_revision: Union[str, None] = '2bc75cfe65ae'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# the tables of app/shared/models.py as create_all made them before the revisions that follow
+TABLES = {
+    'users': """
+        id UUID PRIMARY KEY,
+        name VARCHAR NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT now(),
+        updated_on TIMESTAMP NOT NULL DEFAULT now()
+    """,
+    'toys': """
+        id UUID PRIMARY KEY,
+        name VARCHAR NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT now(),
+        updated_on TIMESTAMP NOT NULL DEFAULT now()
+    """,
+    'user_toy': """
+        users_id UUID REFERENCES users (id),
+        toys_id UUID REFERENCES toys (id)
+    """,
+}
+
+# table comment telling the downgrade which tables are this revision's to drop
+CREATED = 'created by alembic revision 1a7e4c90b3d5'
+
+
+def _comment(table: str) -> str | None:
+    return op.get_bind().scalar(
+        sa.text("SELECT obj_description(to_regclass(:table), 'pg_class')"), {'table': table}
+    )
+
+
+def _exists(table: str) -> bool:
+    return op.get_bind().scalar(sa.text("SELECT to_regclass(:table) IS NOT NULL"), {'table': table})
+
+
+def upgrade() -> None:
+    # a database seeded from toys.sql has them already: those join the chain as they are,
+    # and the downgrade leaves them alone
+    for table, columns in TABLES.items():
+        if _exists(table):
+            continue
+        op.execute(f"CREATE TABLE {table} ({columns})")
+        op.execute(f"COMMENT ON TABLE {table} IS '{CREATED}'")
+
+
+def downgrade() -> None:
+    for table in reversed(TABLES):
+        if _exists(table) and _comment(table) == CREATED:
+            op.execute(f"DROP TABLE {table}")
@@ -0,0 +1,86 @@
+"""uuid7 defaults
+
+Revision ID: 3d8f6b2e91c4
+Revises: e7a90c15d2b8
+Create Date: 2026-10-18 17:55:03.648129
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d8f6b2e91c4'
+down_revision: Union[str, None] = 'e7a90c15d2b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('toys', 'users')
+
+
+def _default(table: str) -> str | None:
+    return op.get_bind().scalar(
+        sa.text(
+            """
+            SELECT column_default FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = :table AND column_name = 'id'
+            """
+        ),
+        {'table': table},
+    )
+
+
+def upgrade() -> None:
+    # what the downgrade puts back: uuid_generate_v4() from an older toys.sql, nothing from
+    # create_all, or uuid_generate_v7() itself from the current toys.sql
+    prior = {table: _default(table) for table in TABLES}
+    prior['function'] = op.get_bind().scalar(
+        sa.text("SELECT to_regprocedure('uuid_generate_v7()') IS NOT NULL")
+    )
+    # the app generates the keys itself (app/shared/ids.py), the server defaults only
+    # matter to rows inserted by hand; postgres has no uuidv7() before 18: the unix
+    # milliseconds are written over the first 48 bits of a v4, whose version becomes 7
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION uuid_generate_v7() RETURNS uuid AS $$
+            SELECT encode(
+                set_bit(
+                    set_bit(
+                        overlay(
+                            uuid_send(gen_random_uuid())
+                            PLACING substring(
+                                int8send((extract(epoch FROM clock_timestamp()) * 1000)::bigint)
+                                FROM 3
+                            )
+                            FROM 1 FOR 6
+                        ),
+                        52, 1
+                    ),
+                    53, 1
+                ),
+                'hex'
+            )::uuid
+        $$ LANGUAGE sql VOLATILE
+        """
+    )
+    comment = json.dumps(prior).replace("'", "''")
+    op.execute(f"COMMENT ON FUNCTION uuid_generate_v7() IS '{comment}'")
+    for table in TABLES:
+        op.alter_column(table, 'id', server_default=sa.text('uuid_generate_v7()'))
+
+
+def downgrade() -> None:
+    comment = op.get_bind().scalar(
+        sa.text("SELECT obj_description('uuid_generate_v7()'::regprocedure, 'pg_proc')")
+    )
+    prior = json.loads(comment or '{}')
+    for table in TABLES:
+        default = prior.get(table)
+        op.alter_column(table, 'id', server_default=sa.text(default) if default else None)
+    if prior.get('function'):
+        op.execute("COMMENT ON FUNCTION uuid_generate_v7() IS NULL")
+    else:
+        op.execute("DROP FUNCTION uuid_generate_v7()")
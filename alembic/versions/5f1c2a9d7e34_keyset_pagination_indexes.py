@@ -0,0 +1,32 @@
+"""keyset pagination indexes
+
+Revision ID: 5f1c2a9d7e34
+Revises: 1a7e4c90b3d5
+Create Date: 2026-10-18 09:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f1c2a9d7e34'
+down_revision: Union[str, None] = '1a7e4c90b3d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # toys.sql creates them as well
+    op.create_index(
+        'ix_toys_created_at_id', 'toys', ['created_at', 'id'], unique=False, if_not_exists=True
+    )
+    op.create_index(
+        'ix_users_created_at_id', 'users', ['created_at', 'id'], unique=False, if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_created_at_id', table_name='users')
+    op.drop_index('ix_toys_created_at_id', table_name='toys')
@@ -0,0 +1,65 @@
+"""unique toy name
+
+Revision ID: 8c3d41b7a2f0
+Revises: 5f1c2a9d7e34
+Create Date: 2026-10-18 10:47:05.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c3d41b7a2f0'
+down_revision: Union[str, None] = '5f1c2a9d7e34'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # duplicates created by the racy select-then-insert must go before the unique index:
+    # every association moves to the oldest toy of each name, then the others are dropped.
+    # Associations that would end up the same once moved, a user owning two toys of one
+    # name or one of them twice, are dropped first: user_toy may have a primary key
+    # (toys.sql) that the remap would violate. The one already on the kept toy stays
+    op.execute(
+        """
+        WITH ranked AS (
+            SELECT id, first_value(id) OVER (PARTITION BY name ORDER BY created_at, id) AS keep
+            FROM toys
+        ),
+        moved AS (
+            SELECT user_toy.ctid, row_number() OVER (
+                PARTITION BY user_toy.users_id, ranked.keep
+                ORDER BY ranked.id = ranked.keep DESC, user_toy.ctid
+            ) AS n
+            FROM user_toy JOIN ranked ON ranked.id = user_toy.toys_id
+        )
+        DELETE FROM user_toy USING moved
+        WHERE user_toy.ctid = moved.ctid AND moved.n > 1
+        """
+    )
+    op.execute(
+        """
+        WITH ranked AS (
+            SELECT id, first_value(id) OVER (PARTITION BY name ORDER BY created_at, id) AS keep
+            FROM toys
+        )
+        UPDATE user_toy SET toys_id = ranked.keep
+        FROM ranked
+        WHERE user_toy.toys_id = ranked.id AND ranked.id <> ranked.keep
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM toys a USING toys b
+        WHERE a.name = b.name AND (a.created_at, a.id) > (b.created_at, b.id)
+        """
+    )
+    # toys.sql creates it as well
+    op.create_index('ix_toys_name', 'toys', ['name'], unique=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_toys_name', table_name='toys')
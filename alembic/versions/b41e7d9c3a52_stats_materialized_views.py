@@ -0,0 +1,60 @@
+"""stats materialized views
+
+Revision ID: b41e7d9c3a52
+Revises: 8c3d41b7a2f0
+Create Date: 2026-10-18 15:12:40.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41e7d9c3a52'
+down_revision: Union[str, None] = '8c3d41b7a2f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # read by the /stats endpoints, refreshed by app/shared/stats.py; REFRESH ... CONCURRENTLY
+    # needs a unique index on each view. toys.sql creates them as well
+    op.execute(
+        """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS toy_popularity AS
+        SELECT toys.id AS toy_id, toys.name, count(user_toy.users_id) AS owners
+        FROM toys LEFT JOIN user_toy ON user_toy.toys_id = toys.id
+        GROUP BY toys.id, toys.name
+        """
+    )
+    op.create_index(
+        'ix_toy_popularity_toy_id', 'toy_popularity', ['toy_id'], unique=True, if_not_exists=True
+    )
+    op.create_index(
+        'ix_toy_popularity_owners',
+        'toy_popularity',
+        [sa.text('owners DESC'), 'toy_id'],
+        if_not_exists=True,
+    )
+    op.execute(
+        """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS user_toy_counts AS
+        SELECT users.id AS user_id, count(user_toy.toys_id) AS toys
+        FROM users LEFT JOIN user_toy ON user_toy.users_id = users.id
+        GROUP BY users.id
+        """
+    )
+    op.create_index(
+        'ix_user_toy_counts_user_id',
+        'user_toy_counts',
+        ['user_id'],
+        unique=True,
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW user_toy_counts")
+    op.execute("DROP MATERIALIZED VIEW toy_popularity")
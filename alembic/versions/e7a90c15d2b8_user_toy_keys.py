@@ -0,0 +1,53 @@
+"""user_toy keys
+
+Revision ID: e7a90c15d2b8
+Revises: b41e7d9c3a52
+Create Date: 2026-10-18 16:40:21.774390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a90c15d2b8'
+down_revision: Union[str, None] = 'b41e7d9c3a52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # the primary key can hold neither half empty nor repeated associations
+    op.execute("DELETE FROM user_toy WHERE users_id IS NULL OR toys_id IS NULL")
+    op.execute(
+        """
+        DELETE FROM user_toy a USING user_toy b
+        WHERE a.ctid > b.ctid AND a.users_id = b.users_id AND a.toys_id = b.toys_id
+        """
+    )
+    # schemas created from toys.sql have it already, those from create_all do not
+    op.execute(
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_constraint
+                WHERE conrelid = 'user_toy'::regclass AND contype = 'p'
+            ) THEN
+                ALTER TABLE user_toy ADD CONSTRAINT user_toy_pkey PRIMARY KEY (users_id, toys_id);
+            END IF;
+        END $$
+        """
+    )
+    # the primary key serves lookups by user, this one those by toy: co-owners, the
+    # toy_popularity refresh and the foreign key checks of toy deletes
+    op.create_index(
+        'ix_user_toy_toys_id', 'user_toy', ['toys_id', 'users_id'], if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    # the primary key stays: the upgrade may have found it in place, and the rows it
+    # deleted cannot be brought back anyway
+    op.drop_index('ix_user_toy_toys_id', table_name='user_toy')
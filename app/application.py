@@ -1,6 +1,13 @@
+import asyncio
 from contextlib import asynccontextmanager
+from anyio import to_thread
 from fastapi import APIRouter, FastAPI
+from fastapi.responses import JSONResponse
+from .shared.responses import DTOResponse
+from .shared.telemetry import RequestStatsMiddleware, metrics, telemetry
 from .shared.database import sessionmanager
+from .shared import ids
+from .shared.health import watch_pool
 from .settings import AppSettings, get_settings
 
 
@@ -14,6 +21,8 @@ class Application:
         db_url: str,
         init_db: bool,
     ):
+        ids.use(settings.ID_STRATEGY)
+        telemetry.prepared_stats = settings.DB_PREPARED_STATS
         if init_db:
             db_str = settings.DATABASE_URI if settings.DATABASE_URI != "" else db_url
             sessionmanager.init(
@@ -25,14 +34,36 @@ class Application:
         @asynccontextmanager
         async def lifespan(app: FastAPI):
             print("Welcome 🛬")
+            # a thread per pooled connection: more threads would only queue on the pool
+            to_thread.current_default_thread_limiter().total_tokens = settings.thread_limit
             print(f"Application v{app.version} started elegantly!")
+            watcher = None
+            if settings.DB_LIVENESS == "background":
+                watcher = asyncio.create_task(
+                    watch_pool(
+                        lambda: to_thread.run_sync(sessionmanager.validate_idle),
+                        settings.DB_HEALTH_CHECK_INTERVAL,
+                    )
+                )
             yield
+            if watcher is not None:
+                watcher.cancel()
             if sessionmanager._engine is not None:
                 sessionmanager.close()
             get_settings.cache_clear()
             print(f"Application v{app.version} shut down gracefully!")
 
-        self.__app = FastAPI(lifespan=lifespan, **settings.set_app_attributes)  # type: ignore
+        self.__app = FastAPI(
+            lifespan=lifespan,
+            default_response_class=DTOResponse if settings.ORJSON_RESPONSES else JSONResponse,
+            **settings.set_app_attributes,  # type: ignore
+        )
+        self.__app.add_middleware(
+            RequestStatsMiddleware,
+            statement_budget=settings.DB_STATEMENT_BUDGET,
+            repeat_threshold=settings.DB_REPEAT_THRESHOLD,
+        )
+        self.__app.add_api_route("/metrics", metrics, include_in_schema=False)
         self.__add_routes(router=router)
 
     def __add_routes(self, router: APIRouter | None):
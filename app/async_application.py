@@ -1,6 +1,19 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import APIRouter, FastAPI
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from .shared.responses import DTOResponse
+from .shared.telemetry import RequestStatsMiddleware, metrics, telemetry
 from .shared.async_database import asyncsessionmanager
+from .shared.admission import AdmissionController, AdmissionMiddleware
+from .shared.batcher import insert_toys, toybatcher
+from .shared.cache import LocalCache, toycache
+from .shared import ids
+from .shared.health import watch_pool
+from .shared.replicas import StickyWritesMiddleware
+from .shared.sessions import ReleasingSession
+from .shared.stats import statsrefresher
 from .settings import AppSettings, get_settings
 
 
@@ -14,25 +27,79 @@ class AsyncApp:
         db_url: str,
         init_db: bool,
     ):
+        ids.use(settings.ID_STRATEGY)
+        telemetry.prepared_stats = settings.DB_PREPARED_STATS
         if init_db:
             db_str = settings.DATABASE_URI if settings.DATABASE_URI != '' else db_url
             asyncsessionmanager.init(
                 db_str,
                 settings.set_engine_args,
                 settings.set_session_args,
+                replicas=settings.replica_uris,
+                balance=settings.DB_REPLICA_BALANCE,
+                cooldown=settings.DB_REPLICA_COOLDOWN,
+                read_session_class=ReleasingSession if settings.DB_RELEASE_EARLY else AsyncSession,
             )
+        if settings.TOY_CACHE_ENABLED:
+            toycache.init(LocalCache(settings.TOY_CACHE_SIZE, settings.TOY_CACHE_TTL))
 
         @asynccontextmanager
         async def lifespan(app: FastAPI):
             print("Welcome 🛬")
             print(f"Application v{app.version} started elegantly!")
+            watcher = None
+            if settings.DB_LIVENESS == "background":
+                watcher = asyncio.create_task(
+                    watch_pool(asyncsessionmanager.validate_idle, settings.DB_HEALTH_CHECK_INTERVAL)
+                )
+            if settings.TOY_WRITE_BATCHING:
+                toybatcher.start(
+                    insert_toys, settings.TOY_BATCH_SIZE, settings.TOY_BATCH_DELAY_MS / 1000
+                )
+            if settings.STATS_REFRESH_INTERVAL or settings.STATS_REFRESH_ON_WRITE:
+                statsrefresher.start(
+                    settings.STATS_REFRESH_INTERVAL, settings.STATS_REFRESH_ON_WRITE
+                )
             yield
+            await statsrefresher.stop()
+            await toybatcher.stop()
+            if watcher is not None:
+                watcher.cancel()
             if asyncsessionmanager._engine is not None:
                 await asyncsessionmanager.close()
+            toycache.close()
             get_settings.cache_clear()
             print(f"Application v{app.version} shut down gracefully!")
 
-        self.__app = FastAPI(lifespan=lifespan, **settings.set_app_attributes)  # type: ignore
+        self.__app = FastAPI(
+            lifespan=lifespan,
+            default_response_class=DTOResponse if settings.ORJSON_RESPONSES else JSONResponse,
+            **settings.set_app_attributes,  # type: ignore
+        )
+        self.__app.add_middleware(
+            RequestStatsMiddleware,
+            statement_budget=settings.DB_STATEMENT_BUDGET,
+            repeat_threshold=settings.DB_REPEAT_THRESHOLD,
+        )
+        if settings.replica_uris:
+            self.__app.add_middleware(StickyWritesMiddleware, max_age=settings.DB_STICKY_SECONDS)
+        if settings.ADMISSION_CONTROL:
+            controller = AdmissionController(
+                capacity=settings.admission_capacity,
+                max_queue={
+                    "read": settings.ADMISSION_READ_QUEUE,
+                    "write": settings.ADMISSION_WRITE_QUEUE,
+                },
+                max_wait=settings.ADMISSION_MAX_WAIT,
+                write_reserved=settings.ADMISSION_WRITE_RESERVED,
+            )
+            # outermost: a shed request costs no other middleware
+            self.__app.add_middleware(
+                AdmissionMiddleware,
+                controller=controller,
+                retry_after=settings.ADMISSION_RETRY_AFTER,
+            )
+        self.__app.add_api_route("/metrics", metrics, include_in_schema=False)
         self.__add_routes(router=router)
 
     def __add_routes(self, router: APIRouter | None):
@@ -1,43 +1,216 @@
+import asyncio
 from http import HTTPStatus
+from typing import Annotated, Any, AsyncIterator, Awaitable, Callable, Hashable, TypeVar
 from uuid import UUID
-from fastapi import APIRouter, HTTPException
-from sqlalchemy import select
-from .shared.schema import ToyRequest, ToyDTO, UserRequest, UserDTO
-from .shared.models import ToyModel, UserModel
-from .shared.async_database import AsyncSessionDep
+from fastapi import APIRouter, Body, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .settings import settings
+from .shared.schema import (
+    Page,
+    PopularToyDTO,
+    ToyRequest,
+    ToyDTO,
+    UserRequest,
+    UserDTO,
+    UserSummaryDTO,
+    UserToyCountDTO,
+)
+from .shared.models import ToyModel, UserModel, user_toy_association
+from .shared.async_database import (
+    AsyncReadSessionDep,
+    AsyncSessionDep,
+    asyncsessionmanager,
+    copy_records,
+    retry_read,
+)
+from .shared.batcher import toybatcher
+from .shared.cache import toycache
+from .shared.deadlines import DeadlineRoute
+from .shared.ids import new_id
+from .shared.pagination import (
+    NDJSON_MEDIA_TYPE,
+    AfterQuery,
+    LimitQuery,
+    StreamQuery,
+    keyset,
+    ndjson_line,
+    next_cursor,
+    paginate,
+)
+from .shared.queries import (
+    UserHydrator,
+    count_co_owners,
+    select_toys,
+    select_user_toys,
+    select_users_with_toys,
+    toys_from_rows,
+    upsert_toy,
+    upsert_toys,
+)
+from .shared.replicas import STICKY_COOKIE
+from .shared.records import (
+    PageRecord,
+    UserRecord,
+    UserRecordHydrator,
+    toy_record,
+    user_record,
+)
+from .shared.responses import respond
+from .shared.singleflight import singleflight
+from .shared.stats import statsrefresher, toy_popularity, user_toy_counts
 
-async_router = APIRouter(tags=["Async Router"])
+async_router = APIRouter(tags=["Async Router"], route_class=DeadlineRoute)
+
+T = TypeVar("T")
+
+BulkToyRequest = Annotated[
+    list[ToyRequest], Body(min_length=1, max_length=settings.BULK_MAX_ITEMS)
+]
+BulkUserRequest = Annotated[
+    list[UserRequest], Body(min_length=1, max_length=settings.BULK_MAX_ITEMS)
+]
 
 
 @async_router.post("/toys", status_code=HTTPStatus.CREATED)
 async def create_toy(session: AsyncSessionDep, input: ToyRequest) -> ToyDTO:
+    cached = await toycache.by_name(input.name)
+    if cached:
+        return respond(cached, HTTPStatus.CREATED)
+    if toybatcher.running:
+        dto = await toybatcher.submit(input.name)
+        statsrefresher.touch()
+        await toycache.put(dto)
+        return respond(dto, HTTPStatus.CREATED)
+    if session.bind.dialect.name == "postgresql":
+        result = await session.execute(upsert_toy(input.name))
+        dto = ToyDTO.model_validate(result.one())
+        await session.commit()
+        statsrefresher.touch()
+        await toycache.put(dto)
+        return respond(dto, HTTPStatus.CREATED)
     result = await session.scalars(select(ToyModel).where(ToyModel.name == input.name))
     existing_toy = result.one_or_none()
     if existing_toy:
-        return ToyDTO.model_validate(existing_toy)
+        dto = ToyDTO.model_validate(existing_toy)
+        await toycache.put(dto)
+        return respond(dto, HTTPStatus.CREATED)
     toy = ToyModel(**input.model_dump())
     session.add(toy)
+    # flush INSERTs and reads the generated columns back, the DTO is built before
+    # commit expires them
+    await session.flush()
+    dto = ToyDTO.model_validate(toy)
     await session.commit()
-    await session.refresh(toy)
-    return ToyDTO.model_validate(toy)
+    statsrefresher.touch()
+    await toycache.put(dto)
+    return respond(dto, HTTPStatus.CREATED)
+
+
+async def stream_rows(
+    stmt: Select, to_dto: Callable[[Any], Any], scalars: bool = True, primary: bool = False
+) -> AsyncIterator[bytes]:
+    # the request session is closed before the body is sent, so the stream owns
+    # its session and server-side cursor until the last row is written
+    async with asyncsessionmanager.read_session(primary) as session:
+        stmt = stmt.execution_options(yield_per=settings.DB_STREAM_YIELD_PER)
+        result = await retry_read(session, lambda: session.stream(stmt))
+        async for row in result.scalars() if scalars else result:
+            yield ndjson_line(to_dto(row))
+
+
+async def read(
+    name: str, key: Hashable, session: AsyncSession, load: Callable[[AsyncSession], Awaitable[T]]
+) -> T:
+    """
+    Run `load` on the request session, or, for the handlers in SINGLE_FLIGHT_ROUTES,
+    share it with the identical concurrent reads. A shared read owns its session, so
+    the request session stays unused and never checks out a connection.
+    """
+    if name not in settings.single_flight_routes:
+        return await load(session)
+    primary = asyncsessionmanager.reads_primary(session)
+
+    async def flight() -> T:
+        async with asyncsessionmanager.read_session(primary) as own:
+            return await load(own)
+
+    return await singleflight.do(name, (name, primary, key), flight)
 
 
 @async_router.get("/toys", status_code=HTTPStatus.OK)
-async def get_all_toys(session: AsyncSessionDep) -> list[ToyDTO]:
-    result = await session.scalars(select(ToyModel))
-    toys = result.all()
-    return [ToyDTO.model_validate(toy) for toy in toys]
+async def get_all_toys(
+    request: Request,
+    session: AsyncReadSessionDep,
+    limit: LimitQuery = settings.PAGE_DEFAULT_LIMIT,
+    after: AfterQuery = None,
+    stream: StreamQuery = False,
+) -> Page[ToyDTO]:
+    core = settings.DB_READ_PATH == "core"
+    records = settings.RESPONSE_RECORDS
+    stmt = select_toys() if core else select(ToyModel)
+    to_dto = toy_record if records else ToyDTO.model_validate
+    page = PageRecord if records else Page[ToyDTO]
+    if stream:
+        rows = stream_rows(
+            keyset(stmt, ToyModel, after),
+            to_dto,
+            scalars=not core,
+            primary=STICKY_COOKIE in request.cookies,
+        )
+        return StreamingResponse(rows, media_type=NDJSON_MEDIA_TYPE)  # type: ignore
+    stmt = paginate(stmt, ToyModel, limit, after)
+
+    async def load(session: AsyncSession) -> Page[ToyDTO] | PageRecord:
+        if core:
+            result = await retry_read(session, lambda: session.execute(stmt))
+            rows, next = next_cursor(result.all(), limit)
+            items = [to_dto(row) for row in rows] if records else toys_from_rows(rows)
+            return page(items=items, next=next)
+        result = await retry_read(session, lambda: session.scalars(stmt))
+        toys, next = next_cursor(result.all(), limit)
+        return page(items=[to_dto(toy) for toy in toys], next=next)
+
+    return respond(await read("get_all_toys", (limit, after), session, load))
 
 
 @async_router.get("/toys/{id}", status_code=HTTPStatus.OK)
-async def get_toy_by_id(id: UUID, session: AsyncSessionDep) -> ToyDTO:
-    toy = await session.get(ToyModel, id)
-    if not toy:
+async def get_toy_by_id(id: UUID, session: AsyncReadSessionDep) -> ToyDTO:
+    cached = await toycache.by_id(id)
+    if cached:
+        return respond(cached)
+
+    async def load(session: AsyncSession) -> ToyDTO | None:
+        if settings.DB_READ_PATH == "core":
+            stmt = select_toys().where(ToyModel.id == id)
+            result = await retry_read(session, lambda: session.execute(stmt))
+            toys = toys_from_rows(result.all())
+            return toys[0] if toys else None
+        toy = await retry_read(session, lambda: session.get(ToyModel, id))
+        return ToyDTO.model_validate(toy) if toy else None
+
+    dto = await read("get_toy_by_id", id, session, load)
+    if not dto:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND,
             detail=f"can not find if toy with id: {id}",
         )
-    return ToyDTO.model_validate(toy)
+    await toycache.put(dto)
+    return respond(dto)
+
+
+@async_router.post("/toys:bulk", status_code=HTTPStatus.CREATED)
+async def create_toys(session: AsyncSessionDep, input: BulkToyRequest) -> list[ToyDTO]:
+    # ON CONFLICT can not touch the same row twice within a statement
+    names = list(dict.fromkeys(toy.name for toy in input))
+    result = await session.execute(upsert_toys(), [{"name": name} for name in names])
+    toys = {toy.name: toy for toy in toys_from_rows(result.all())}
+    await session.commit()
+    statsrefresher.touch()
+    for toy in toys.values():
+        await toycache.put(toy)
+    return respond([toys[toy.name] for toy in input], HTTPStatus.CREATED)
 
 
 @async_router.post("/users", status_code=HTTPStatus.CREATED)
@@ -51,25 +224,169 @@ async def create_user(session: AsyncSessionDep, input: UserRequest) -> UserDTO:
             status_code=HTTPStatus.NOT_FOUND,
             detail=f"can not find if toy with ids: {ids}",
         )
+    for toy in toys:
+        await toycache.put(ToyDTO.model_validate(toy))
     user = UserModel(**data, toys=toys)
     session.add(user)
+    await session.flush()
+    dto = UserDTO.model_validate(user)
+    await session.commit()
+    statsrefresher.touch()
+    return respond(dto, HTTPStatus.CREATED)
+
+
+@async_router.post("/users:bulk", status_code=HTTPStatus.CREATED)
+async def create_users(session: AsyncSessionDep, input: BulkUserRequest) -> list[UserDTO]:
+    ids = {id for user in input for id in user.toys}
+    result = await session.execute(select_toys().where(ToyModel.id.in_(ids)))
+    toys = {toy.id: toy for toy in toys_from_rows(result.all())}
+    if missing := ids - toys.keys():
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND,
+            detail=f"can not find if toy with ids: {sorted(map(str, missing))}",
+        )
+    users = [
+        UserDTO(id=new_id(), name=user.name, toys=[toys[id] for id in dict.fromkeys(user.toys)])
+        for user in input
+    ]
+    rows = [(user.id, user.name) for user in users]
+    links = [(user.id, toy.id) for user in users for toy in user.toys]
+    if settings.BULK_USE_COPY and session.bind.dialect.driver == "asyncpg":
+        await copy_records(session, UserModel.__tablename__, ["id", "name"], rows)
+        await copy_records(session, user_toy_association.name, ["users_id", "toys_id"], links)
+    else:
+        await session.execute(insert(UserModel), [{"id": id, "name": name} for id, name in rows])
+        await session.execute(
+            insert(user_toy_association),
+            [{"users_id": user_id, "toys_id": toy_id} for user_id, toy_id in links],
+        )
     await session.commit()
-    await session.refresh(user)
-    return UserDTO.model_validate(user)
+    statsrefresher.touch()
+    return respond(users, HTTPStatus.CREATED)
 
 
 @async_router.get("/users", status_code=HTTPStatus.OK)
-async def get_all_users(session: AsyncSessionDep) -> list[UserDTO]:
-    result = await session.scalars(select(UserModel))
-    users = result.all()
-    return [UserDTO.model_validate(user) for user in users]
+async def get_all_users(
+    request: Request,
+    session: AsyncReadSessionDep,
+    limit: LimitQuery = settings.PAGE_DEFAULT_LIMIT,
+    after: AfterQuery = None,
+    stream: StreamQuery = False,
+) -> Page[UserDTO]:
+    aggregate = settings.DB_USERS_LOADER == "aggregate"
+    records = settings.RESPONSE_RECORDS
+    if aggregate:
+        stmt = select_users_with_toys()
+        to_dto = UserRecordHydrator() if records else UserHydrator()
+    else:
+        stmt, to_dto = select(UserModel), user_record if records else UserDTO.model_validate
+    page = PageRecord if records else Page[UserDTO]
+    if stream:
+        rows = stream_rows(
+            keyset(stmt, UserModel, after),
+            to_dto,
+            scalars=not aggregate,
+            primary=STICKY_COOKIE in request.cookies,
+        )
+        return StreamingResponse(rows, media_type=NDJSON_MEDIA_TYPE)  # type: ignore
+    stmt = paginate(stmt, UserModel, limit, after)
+
+    async def load(session: AsyncSession) -> Page[UserDTO] | PageRecord:
+        result = await retry_read(
+            session, lambda: session.execute(stmt) if aggregate else session.scalars(stmt)
+        )
+        users, next = next_cursor(result.all(), limit)
+        return page(items=[to_dto(user) for user in users], next=next)
+
+    return respond(await read("get_all_users", (limit, after), session, load))
 
 
 @async_router.get("/users/{id}", status_code=HTTPStatus.OK)
-async def get_user_by_id(id: UUID, session: AsyncSessionDep) -> UserDTO:
-    user = await session.get(UserModel, id)
-    if not user:
+async def get_user_by_id(id: UUID, session: AsyncReadSessionDep) -> UserDTO:
+    to_dto = user_record if settings.RESPONSE_RECORDS else UserDTO.model_validate
+
+    async def load(session: AsyncSession) -> UserDTO | UserRecord | None:
+        user = await retry_read(session, lambda: session.get(UserModel, id))
+        return to_dto(user) if user else None
+
+    dto = await read("get_user_by_id", id, session, load)
+    if not dto:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail=f"can not find user with id: {id}"
+        )
+    return respond(dto)
+
+
+@async_router.get("/users/{id}/summary", status_code=HTTPStatus.OK)
+async def get_user_summary(id: UUID, request: Request) -> UserSummaryDTO:
+    user = select(UserModel.id, UserModel.name).where(UserModel.id == id)
+    # independent reads, each on a connection of its own instead of one after another
+    try:
+        users, toys, co_owners = await asyncsessionmanager.gather_reads(
+            [
+                lambda session: session.execute(user),
+                lambda session: session.execute(select_user_toys(id)),
+                lambda session: session.scalar(count_co_owners(id)),
+            ],
+            timeout=settings.DB_FANOUT_TIMEOUT,
+            width=settings.DB_FANOUT_WIDTH,
+            primary=STICKY_COOKIE in request.cookies,
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=HTTPStatus.GATEWAY_TIMEOUT,
+            detail=f"user summary exceeded {settings.DB_FANOUT_TIMEOUT}s",
+        )
+    row = users.one_or_none()
+    if not row:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail=f"can not find user with id: {id}"
         )
-    return UserDTO.model_validate(user)
+    items = toys_from_rows(toys.all())
+    summary = UserSummaryDTO(
+        id=row.id, name=row.name, toys=items, toy_count=len(items), co_owners=co_owners
+    )
+    return respond(summary)
+
+
+# aggregates read from the materialized views of app/shared/stats.py: the cost follows the
+# result instead of the user_toy table, at the price of lagging behind by one refresh
+
+
+@async_router.get("/stats/toys/popular", status_code=HTTPStatus.OK)
+async def get_popular_toys(
+    session: AsyncReadSessionDep, limit: LimitQuery = 10
+) -> list[PopularToyDTO]:
+    stmt = (
+        select(toy_popularity.c.toy_id.label("id"), toy_popularity.c.name, toy_popularity.c.owners)
+        .order_by(toy_popularity.c.owners.desc(), toy_popularity.c.toy_id)
+        .limit(limit)
+    )
+    result = await retry_read(session, lambda: session.execute(stmt))
+    return respond([PopularToyDTO.model_validate(row._asdict()) for row in result.all()])
+
+
+@async_router.get("/stats/users/{id}/toy-count", status_code=HTTPStatus.OK)
+async def get_user_toy_count(id: UUID, session: AsyncReadSessionDep) -> UserToyCountDTO:
+    stmt = select(user_toy_counts.c.toys).where(user_toy_counts.c.user_id == id)
+    toys = await retry_read(session, lambda: session.scalar(stmt))
+    if toys is None:
+        # created after the last refresh: count it live, through the user's rows only
+        live = (
+            select(func.count(user_toy_association.c.toys_id))
+            .select_from(UserModel)
+            .outerjoin(user_toy_association, user_toy_association.c.users_id == UserModel.id)
+            .where(UserModel.id == id)
+            .group_by(UserModel.id)
+        )
+        toys = await retry_read(session, lambda: session.scalar(live))
+    if toys is None:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail=f"can not find user with id: {id}"
+        )
+    return respond(UserToyCountDTO(id=id, toys=toys))
+
+
+@async_router.get("/health/pool", status_code=HTTPStatus.OK)
+async def pool_health() -> dict[str, int]:
+    return asyncsessionmanager.pool_stats()
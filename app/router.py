@@ -1,46 +1,119 @@
 from http import HTTPStatus
+from typing import Any, Callable, Iterator
 from uuid import UUID
 from fastapi import APIRouter, HTTPException
-from sqlalchemy import select
-from .shared.schema import ToyRequest, ToyDTO, UserRequest, UserDTO
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, select
+from .settings import settings
+from .shared.schema import Page, ToyRequest, ToyDTO, UserRequest, UserDTO
 from .shared.models import ToyModel, UserModel
-from .shared.database import SessionDep
+from .shared.database import SessionDep, retry_read, sessionmanager, thread_stats
+from .shared.deadlines import DeadlineRoute
+from .shared.pagination import (
+    NDJSON_MEDIA_TYPE,
+    AfterQuery,
+    LimitQuery,
+    StreamQuery,
+    keyset,
+    ndjson_line,
+    next_cursor,
+    paginate,
+)
+from .shared.queries import (
+    UserHydrator,
+    select_toys,
+    select_users_with_toys,
+    toys_from_rows,
+    upsert_toy,
+)
+from .shared.records import PageRecord, UserRecordHydrator, toy_record, user_record
+from .shared.responses import respond
 
-router = APIRouter(tags=["Router"])
+router = APIRouter(tags=["Router"], route_class=DeadlineRoute)
+
+# Handlers are plain functions: Starlette runs them, the session dependency and sync
+# streams on anyio's worker threads, sized by Application to the connection pool, so
+# the blocking driver never stalls the event loop.
 
 
 @router.post("/toys", status_code=HTTPStatus.CREATED)
-async def create_toy(session: SessionDep, input: ToyRequest) -> ToyDTO:
+def create_toy(session: SessionDep, input: ToyRequest) -> ToyDTO:
+    if session.bind.dialect.name == "postgresql":
+        result = session.execute(upsert_toy(input.name))
+        dto = ToyDTO.model_validate(result.one())
+        session.commit()
+        return respond(dto, HTTPStatus.CREATED)
     result = session.scalars(select(ToyModel).where(ToyModel.name == input.name))
     existing_toy = result.one_or_none()
     if existing_toy:
-        return ToyDTO.model_validate(existing_toy)
+        return respond(ToyDTO.model_validate(existing_toy), HTTPStatus.CREATED)
     toy = ToyModel(**input.model_dump())
     session.add(toy)
+    # flush INSERTs and reads the generated columns back, the DTO is built before
+    # commit expires them
+    session.flush()
+    dto = ToyDTO.model_validate(toy)
     session.commit()
-    session.refresh(toy)
-    return ToyDTO.model_validate(toy)
+    return respond(dto, HTTPStatus.CREATED)
+
+
+def stream_rows(
+    stmt: Select, to_dto: Callable[[Any], Any], scalars: bool = True
+) -> Iterator[bytes]:
+    # the request session is closed before the body is sent, so the stream owns
+    # its session and server-side cursor until the last row is written
+    with sessionmanager.session() as session:
+        result = session.execute(
+            stmt.execution_options(yield_per=settings.DB_STREAM_YIELD_PER)
+        )
+        for row in result.scalars() if scalars else result:
+            yield ndjson_line(to_dto(row))
 
 
 @router.get("/toys", status_code=HTTPStatus.OK)
-async def get_all_toys(session: SessionDep) -> list[ToyDTO]:
-    result = session.scalars(select(ToyModel))
-    toys = result.all()
-    return [ToyDTO.model_validate(toy) for toy in toys]
+def get_all_toys(
+    session: SessionDep,
+    limit: LimitQuery = settings.PAGE_DEFAULT_LIMIT,
+    after: AfterQuery = None,
+    stream: StreamQuery = False,
+) -> Page[ToyDTO]:
+    core = settings.DB_READ_PATH == "core"
+    records = settings.RESPONSE_RECORDS
+    stmt = select_toys() if core else select(ToyModel)
+    to_dto = toy_record if records else ToyDTO.model_validate
+    page = PageRecord if records else Page[ToyDTO]
+    if stream:
+        rows = stream_rows(keyset(stmt, ToyModel, after), to_dto, scalars=not core)
+        return StreamingResponse(rows, media_type=NDJSON_MEDIA_TYPE)  # type: ignore
+    stmt = paginate(stmt, ToyModel, limit, after)
+    if core:
+        result = retry_read(session, lambda: session.execute(stmt))
+        rows, next = next_cursor(result.all(), limit)
+        items = [to_dto(row) for row in rows] if records else toys_from_rows(rows)
+        return respond(page(items=items, next=next))
+    result = retry_read(session, lambda: session.scalars(stmt))
+    toys, next = next_cursor(result.all(), limit)
+    return respond(page(items=[to_dto(toy) for toy in toys], next=next))
 
 
 @router.get("/toys/{id}", status_code=HTTPStatus.OK)
-async def get_toy_by_id(id: UUID, session: SessionDep) -> ToyDTO:
-    toy = session.get(ToyModel, id)
+def get_toy_by_id(id: UUID, session: SessionDep) -> ToyDTO:
+    if settings.DB_READ_PATH == "core":
+        stmt = select_toys().where(ToyModel.id == id)
+        result = retry_read(session, lambda: session.execute(stmt))
+        toys = toys_from_rows(result.all())
+        toy = toys[0] if toys else None
+    else:
+        toy = retry_read(session, lambda: session.get(ToyModel, id))
     if not toy:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail=f"can not find if toy with id: {id}"
         )
-    return ToyDTO.model_validate(toy)
+    return respond(ToyDTO.model_validate(toy))
 
 
 @router.post("/users", status_code=HTTPStatus.CREATED)
-async def create_user(session: SessionDep, input: UserRequest) -> UserDTO:
+def create_user(session: SessionDep, input: UserRequest) -> UserDTO:
     data = input.model_dump()
     ids = data.pop("toys")
     result = session.scalars(select(ToyModel).where(ToyModel.id.in_(ids)))
@@ -52,23 +125,50 @@ async def create_user(session: SessionDep, input: UserRequest) -> UserDTO:
         )
     user = UserModel(**data, toys=toys)
     session.add(user)
+    session.flush()
+    dto = UserDTO.model_validate(user)
     session.commit()
-    session.refresh(user)
-    return UserDTO.model_validate(user)
+    return respond(dto, HTTPStatus.CREATED)
 
 
 @router.get("/users", status_code=HTTPStatus.OK)
-async def get_all_users(session: SessionDep) -> list[UserDTO]:
-    result = session.scalars(select(UserModel))
-    users = result.all()
-    return [UserDTO.model_validate(user) for user in users]
+def get_all_users(
+    session: SessionDep,
+    limit: LimitQuery = settings.PAGE_DEFAULT_LIMIT,
+    after: AfterQuery = None,
+    stream: StreamQuery = False,
+) -> Page[UserDTO]:
+    aggregate = settings.DB_USERS_LOADER == "aggregate"
+    records = settings.RESPONSE_RECORDS
+    if aggregate:
+        stmt = select_users_with_toys()
+        to_dto = UserRecordHydrator() if records else UserHydrator()
+    else:
+        stmt, to_dto = select(UserModel), user_record if records else UserDTO.model_validate
+    page = PageRecord if records else Page[UserDTO]
+    if stream:
+        rows = stream_rows(keyset(stmt, UserModel, after), to_dto, scalars=not aggregate)
+        return StreamingResponse(rows, media_type=NDJSON_MEDIA_TYPE)  # type: ignore
+    stmt = paginate(stmt, UserModel, limit, after)
+    result = retry_read(
+        session, lambda: session.execute(stmt) if aggregate else session.scalars(stmt)
+    )
+    users, next = next_cursor(result.all(), limit)
+    return respond(page(items=[to_dto(user) for user in users], next=next))
 
 
 @router.get("/users/{id}", status_code=HTTPStatus.OK)
-async def get_user_by_id(id: UUID, session: SessionDep) -> UserDTO:
-    user = session.get(UserModel, id)
+def get_user_by_id(id: UUID, session: SessionDep) -> UserDTO:
+    user = retry_read(session, lambda: session.get(UserModel, id))
     if not user:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail=f"can not find user with id: {id}"
         )
-    return UserDTO.model_validate(user)
+    to_dto = user_record if settings.RESPONSE_RECORDS else UserDTO.model_validate
+    return respond(to_dto(user))
+
+
+@router.get("/health/pool", status_code=HTTPStatus.OK)
+async def pool_health() -> dict[str, int]:
+    # async on purpose: reading the limiter needs the event loop, and never blocks
+    return {**sessionmanager.pool_stats(), **thread_stats()}
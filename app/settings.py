@@ -3,6 +3,7 @@ from functools import lru_cache
 from os import environ
 from pathlib import Path
 from typing import Literal
+from uuid import uuid4
 from typing_extensions import Self
 
 
@@ -16,6 +17,11 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 from sqlalchemy.pool import QueuePool, NullPool
 
 
+def unique_statement_name() -> str:
+    # asyncpg numbers statements per connection, names collide behind a pooler
+    return f"__asyncpg_{uuid4()}__"
+
+
 class AppEnvironment(str, Enum):
     LOCAL = "local"
     PRODUCTION = "production"
@@ -45,6 +51,7 @@ class AppSettings(BaseSettings):
     WORKERS: int = int(environ.get("SERVER_WORKERS", 1))
 
     ECHO_SQL: bool = bool(environ.get("ECHO_SQL", False))
+    ORJSON_RESPONSES: bool = bool(environ.get("ORJSON_RESPONSES", False))
     POSTGRES_SCHEME: str = str(environ.get("POSTGRES_SCHEME", "postgresql+psycopg"))
     POSTGRES_SERVER: str = str(environ.get("POSTGRES_SERVER"))
     POSTGRES_PORT: int = int(environ.get("POSTGRES_PORT", 5432))
@@ -53,10 +60,91 @@ class AppSettings(BaseSettings):
     POSTGRES_DB: str = str(environ.get("POSTGRES_DB"))
     DB_POOL_SIZE: int = int(environ.get("POSTGRES_POOL_SIZE", 20))
     BD_MAX_CONNECTIONS: int = int(environ.get("BD_MAX_CONNECTIONS", 10))
+    # worker threads of the sync stack, 0 sizes it to pool_size + max_overflow
+    DB_THREAD_LIMIT: int = int(environ.get("DB_THREAD_LIMIT", 0))
     BD_POOL_PRE_PING: bool = bool(environ.get("BD_POOL_PRE_PING", True))
+    # pre_ping: SELECT 1 on every checkout; background: ping idle connections every
+    # DB_HEALTH_CHECK_INTERVAL seconds and retry reads that hit a dropped connection
+    DB_LIVENESS: Literal["pre_ping", "background"] = environ.get("DB_LIVENESS", "pre_ping")  # type: ignore
+    DB_HEALTH_CHECK_INTERVAL: float = float(environ.get("DB_HEALTH_CHECK_INTERVAL", 30))
+    # keep it below idle timeouts of the server and of anything in between (PgBouncer, LBs)
+    DB_POOL_RECYCLE: int = int(environ.get("DB_POOL_RECYCLE", 1800))
+    # seconds to wait for a pooled connection before giving up
+    DB_POOL_TIMEOUT: float = float(environ.get("DB_POOL_TIMEOUT", 30))
+    # server side cap of every statement, 0 disables; behind PgBouncer `options` must be
+    # listed in its ignore_startup_parameters, or the timeout set on the role instead
+    DB_STATEMENT_TIMEOUT_MS: int = int(environ.get("DB_STATEMENT_TIMEOUT_MS", 30_000))
+    # seconds a request may run before it is cancelled with a 504, 0 disables, and per
+    # handler overrides, e.g. "get_all_users=2.5,create_users=30"
+    REQUEST_DEADLINE: float = float(environ.get("REQUEST_DEADLINE", 10))
+    ROUTE_DEADLINES: str = environ.get("ROUTE_DEADLINES", "")
     BD_EXPIRES_ON_COMMIT: bool = bool(environ.get("BD_EXPIRES_ON_COMMIT", True))
     DB_AUTO_FLUSH: bool = bool(environ.get("DB_AUTO_FLUSH", False))
+    # primary keys of new rows: time ordered uuid7 or random uuid4, see app/shared/ids.py
+    ID_STRATEGY: Literal["uuid7", "uuid4"] = environ.get("ID_STRATEGY", "uuid7")  # type: ignore
+    # read sessions (GET handlers) hand the connection back to the pool right after each
+    # read, instead of holding it until the session closes after the response is serialized
+    DB_RELEASE_EARLY: bool = bool(environ.get("DB_RELEASE_EARLY", False))
+    # compiled SQL cache of the engine, 0 disables it
+    DB_QUERY_CACHE_SIZE: int = int(environ.get("DB_QUERY_CACHE_SIZE", 500))
+    # asyncpg: prepared statements kept per connection, 0 disables the cache
+    DB_PREPARED_CACHE_SIZE: int = int(environ.get("DB_PREPARED_CACHE_SIZE", 100))
+    # count prepared statement cache hits on /metrics, off by default: it reads private
+    # driver state on every statement
+    DB_PREPARED_STATS: bool = bool(environ.get("DB_PREPARED_STATS", False))
+    # psycopg: executions before a statement is prepared, negative never prepares
+    DB_PREPARE_THRESHOLD: int = int(environ.get("DB_PREPARE_THRESHOLD", 5))
+    # behind PgBouncer: unique statement names, or no prepared statement caches at all
+    DB_PGBOUNCER_MODE: Literal["off", "unique_names", "no_cache"] = environ.get("DB_PGBOUNCER_MODE", "off")  # type: ignore
     DB: str | None = str(environ.get("DB")) or None
+    # comma separated URLs of read replicas for the async stack, same driver as DB
+    DB_REPLICAS: str = environ.get("DB_REPLICAS", "")
+    DB_REPLICA_BALANCE: Literal["round_robin", "least_loaded"] = environ.get("DB_REPLICA_BALANCE", "round_robin")  # type: ignore
+    # seconds a replica is skipped after it failed to hand out a connection
+    DB_REPLICA_COOLDOWN: float = float(environ.get("DB_REPLICA_COOLDOWN", 5))
+    # seconds the reads of a client stay on the primary after one of its writes
+    DB_STICKY_SECONDS: int = int(environ.get("DB_STICKY_SECONDS", 5))
+    # comma separated names of the async GET handlers whose identical concurrent reads
+    # share one query, e.g. "get_all_toys,get_user_by_id"
+    SINGLE_FLIGHT_ROUTES: str = environ.get("SINGLE_FLIGHT_ROUTES", "")
+    DB_USERS_LOADER: Literal["selectin", "aggregate"] = environ.get("DB_USERS_LOADER", "selectin")  # type: ignore
+    DB_READ_PATH: Literal["orm", "core"] = environ.get("DB_READ_PATH", "orm")  # type: ignore
+    DB_STREAM_YIELD_PER: int = int(environ.get("DB_STREAM_YIELD_PER", 500))
+    # reads fanned out by gather_reads: connections one request may hold at a time, and
+    # the seconds they may take together
+    DB_FANOUT_WIDTH: int = int(environ.get("DB_FANOUT_WIDTH", 3))
+    DB_FANOUT_TIMEOUT: float = float(environ.get("DB_FANOUT_TIMEOUT", 5))
+    # serve GET listings and users as slotted dataclasses built from the trusted rows,
+    # skipping the DTO validation; pays off with ORJSON_RESPONSES
+    RESPONSE_RECORDS: bool = bool(environ.get("RESPONSE_RECORDS", False))
+    # request stats warnings, 0 disables: statements per request, repeats of one statement
+    DB_STATEMENT_BUDGET: int = int(environ.get("DB_STATEMENT_BUDGET", 5))
+    DB_REPEAT_THRESHOLD: int = int(environ.get("DB_REPEAT_THRESHOLD", 3))
+    BULK_MAX_ITEMS: int = int(environ.get("BULK_MAX_ITEMS", 10_000))
+    BULK_USE_COPY: bool = bool(environ.get("BULK_USE_COPY", True))
+    # AsyncApp admission control: requests admitted at once (0 is pool_size + max_overflow),
+    # queue bound per lane, seconds in the queue before a 503, slots reads can not take
+    ADMISSION_CONTROL: bool = bool(environ.get("ADMISSION_CONTROL", False))
+    ADMISSION_CAPACITY: int = int(environ.get("ADMISSION_CAPACITY", 0))
+    ADMISSION_READ_QUEUE: int = int(environ.get("ADMISSION_READ_QUEUE", 100))
+    ADMISSION_WRITE_QUEUE: int = int(environ.get("ADMISSION_WRITE_QUEUE", 100))
+    ADMISSION_MAX_WAIT: float = float(environ.get("ADMISSION_MAX_WAIT", 1))
+    ADMISSION_WRITE_RESERVED: int = int(environ.get("ADMISSION_WRITE_RESERVED", 2))
+    ADMISSION_RETRY_AFTER: int = int(environ.get("ADMISSION_RETRY_AFTER", 1))
+    # POST /toys through the write-behind batcher: one INSERT and commit per batch
+    TOY_WRITE_BATCHING: bool = bool(environ.get("TOY_WRITE_BATCHING", False))
+    TOY_BATCH_SIZE: int = int(environ.get("TOY_BATCH_SIZE", 100))
+    TOY_BATCH_DELAY_MS: float = float(environ.get("TOY_BATCH_DELAY_MS", 2))
+    # seconds between refreshes of the /stats materialized views, i.e. how far they may lag
+    # behind the writes, 0 disables them; with STATS_REFRESH_ON_WRITE they are refreshed this
+    # many seconds after a write instead. Either way they are also refreshed at startup
+    STATS_REFRESH_INTERVAL: float = float(environ.get("STATS_REFRESH_INTERVAL", 60))
+    STATS_REFRESH_ON_WRITE: bool = bool(environ.get("STATS_REFRESH_ON_WRITE", False))
+    TOY_CACHE_ENABLED: bool = bool(environ.get("TOY_CACHE_ENABLED", False))
+    TOY_CACHE_SIZE: int = int(environ.get("TOY_CACHE_SIZE", 10_000))
+    TOY_CACHE_TTL: float = float(environ.get("TOY_CACHE_TTL", 60))
+    PAGE_DEFAULT_LIMIT: int = int(environ.get("PAGE_DEFAULT_LIMIT", 100))
+    PAGE_MAX_LIMIT: int = int(environ.get("PAGE_MAX_LIMIT", 1000))
 
     @computed_field  # type: ignore[prop-decorator]
     @property
@@ -98,11 +186,62 @@ class AppSettings(BaseSettings):
         return {  # engine arguments example
             "echo": self.ECHO_SQL,  # print all SQL statements
             # "poolclass": poolclass,  # Poll implementaion
-            "pool_pre_ping": self.BD_POOL_PRE_PING,  # feature will normally emit SQL equivalent to “SELECT 1” each time a connection is checked out from the pool
+            "pool_pre_ping": self.BD_POOL_PRE_PING and self.DB_LIVENESS == "pre_ping",  # feature will normally emit SQL equivalent to “SELECT 1” each time a connection is checked out from the pool
             "pool_size": self.DB_POOL_SIZE,  # number of connections to keep open at a time
             "max_overflow": self.BD_MAX_CONNECTIONS,  # number of connections to allow to be opened above pool_size
+            "pool_recycle": self.DB_POOL_RECYCLE,  # seconds before a connection is replaced on checkout
+            "pool_timeout": self.DB_POOL_TIMEOUT,  # seconds to wait for a connection
+            "query_cache_size": self.DB_QUERY_CACHE_SIZE,  # compiled statements kept by the engine
+            "connect_args": self.set_connect_args,
         }
 
+    @property
+    def set_connect_args(self) -> dict:
+        """
+        Prepared statement and timeout settings of the driver in `DATABASE_URI`, handed to
+        its connect().
+        """
+        driver = self.DATABASE_URI.partition("://")[0].partition("+")[2]
+        no_cache = self.DB_PGBOUNCER_MODE == "no_cache"
+        timeout = self.DB_STATEMENT_TIMEOUT_MS
+        if driver == "asyncpg":
+            cache_size = 0 if no_cache else self.DB_PREPARED_CACHE_SIZE
+            args: dict = {"prepared_statement_cache_size": cache_size}
+            if self.DB_PGBOUNCER_MODE != "off":
+                args["prepared_statement_name_func"] = unique_statement_name
+            if no_cache:
+                args["statement_cache_size"] = 0  # asyncpg's own cache
+            if timeout:
+                args["server_settings"] = {"statement_timeout": str(timeout)}
+            return args
+        args = {"options": f"-c statement_timeout={timeout}"} if timeout else {}
+        if driver == "psycopg":
+            # PgBouncer 1.21+ tracks psycopg's protocol level statements, unique names are moot
+            threshold = self.DB_PREPARE_THRESHOLD
+            args["prepare_threshold"] = None if no_cache or threshold < 0 else threshold
+        return args
+
+    @property
+    def replica_uris(self) -> list[str]:
+        return [url.strip() for url in self.DB_REPLICAS.split(",") if url.strip()]
+
+    @property
+    def single_flight_routes(self) -> set[str]:
+        return {name.strip() for name in self.SINGLE_FLIGHT_ROUTES.split(",") if name.strip()}
+
+    @property
+    def route_deadlines(self) -> dict[str, float]:
+        pairs = (item.partition("=") for item in self.ROUTE_DEADLINES.split(",") if item.strip())
+        return {name.strip(): float(seconds) for name, _, seconds in pairs}
+
+    @property
+    def admission_capacity(self) -> int:
+        return self.ADMISSION_CAPACITY or self.DB_POOL_SIZE + self.BD_MAX_CONNECTIONS
+
+    @property
+    def thread_limit(self) -> int:
+        return self.DB_THREAD_LIMIT or self.DB_POOL_SIZE + self.BD_MAX_CONNECTIONS
+
     @property
     def set_session_args(self) -> dict:
         return {
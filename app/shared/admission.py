@@ -0,0 +1,119 @@
+import asyncio
+from collections import deque
+from typing import Literal
+
+import orjson
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .telemetry import telemetry
+
+Lane = Literal["write", "read"]
+
+# never queued nor rejected, they must answer while the app is overloaded
+EXEMPT_PATHS = ("/metrics", "/health", "/docs", "/redoc", "/openapi.json")
+
+
+class AdmissionController:
+    """
+    Admit at most `capacity` requests at a time, the connections of the pool, so the
+    excess waits here, in bounded queues, rather than inside the pool until its timeout.
+    Writes are admitted first and reads can not take the last `write_reserved` slots;
+    a request that finds its lane's queue full, or waits longer than `max_wait`, is
+    turned away.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        max_queue: dict[Lane, int],
+        max_wait: float,
+        write_reserved: int = 0,
+    ):
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.limits: dict[Lane, int] = {
+            "write": capacity,
+            "read": max(capacity - write_reserved, 1),
+        }
+        self.in_flight = 0
+        self.waiters: dict[Lane, deque[asyncio.Future]] = {"write": deque(), "read": deque()}
+
+    def _may_enter(self, lane: Lane) -> bool:
+        if self.in_flight >= self.limits[lane] or self.waiters[lane]:
+            return False
+        return lane == "write" or not self.waiters["write"]
+
+    async def acquire(self, lane: Lane) -> bool:
+        if self._may_enter(lane):
+            self.in_flight += 1
+            telemetry.admissions[lane, "admitted"] += 1
+            return True
+        waiters = self.waiters[lane]
+        if len(waiters) >= self.max_queue[lane]:
+            telemetry.admissions[lane, "rejected"] += 1
+            return False
+        slot = asyncio.get_running_loop().create_future()
+        waiters.append(slot)
+        telemetry.admissions[lane, "queued"] += 1
+        try:
+            await asyncio.wait_for(slot, self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as error:
+            # the slot may have been handed over in the very tick the wait timed out or
+            # the client went away: pass it on to the next waiter
+            if slot.done() and not slot.cancelled():
+                self.release()
+            if isinstance(error, asyncio.CancelledError):
+                raise
+            telemetry.admissions[lane, "timed_out"] += 1
+            return False
+        finally:
+            if slot in waiters:
+                waiters.remove(slot)
+        telemetry.admissions[lane, "admitted"] += 1
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        for lane in ("write", "read"):
+            waiters = self.waiters[lane]
+            while waiters and self.in_flight < self.limits[lane]:  # type: ignore[index]
+                slot = waiters.popleft()
+                if not slot.done():
+                    slot.set_result(None)
+                    self.in_flight += 1
+
+
+class AdmissionMiddleware:
+    """Shed the load `AdmissionController` turns away with 503 and a `Retry-After`."""
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController, retry_after: int = 1):
+        self.app = app
+        self.controller = controller
+        self.retry_after = str(retry_after).encode()
+        self.body = orjson.dumps({"detail": "server overloaded, retry later"})
+        telemetry.admission = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PATHS):
+            await self.app(scope, receive, send)
+            return
+        lane: Lane = "read" if scope["method"] in ("GET", "HEAD") else "write"
+        if not await self.controller.acquire(lane):
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 503,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(self.body)).encode()),
+                        (b"retry-after", self.retry_after),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": self.body})
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
@@ -1,7 +1,19 @@
+import asyncio
 import contextlib
-from typing import Annotated, AsyncIterator
+from typing import (
+    Annotated,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Literal,
+    Sequence,
+    TypeVar,
+)
 
-from fastapi import Depends
+from fastapi import Depends, Request
+from sqlalchemy.exc import DBAPIError, InterfaceError
 from sqlalchemy.ext.asyncio import (
     AsyncConnection,
     AsyncEngine,
@@ -11,26 +23,91 @@ from sqlalchemy.ext.asyncio import (
 )
 from sqlalchemy.orm import declarative_base
 
+from .replicas import STICKY_COOKIE, ReplicaSet
+from .telemetry import telemetry
+
 Base = declarative_base()
 
+T = TypeVar("T")
+
+# SQLSTATE of a statement cancelled by statement_timeout or pg_cancel_backend
+QUERY_CANCELED = "57014"
+
 
 class AsyncDatabaseSessionManager:
     def __init__(self):
         self._engine: AsyncEngine | None = None
         self._sessionmaker: async_sessionmaker | None = None
+        self._read_sessionmaker: async_sessionmaker | None = None
+        self._replicas = ReplicaSet([])
 
-    def init(self, host: str, engine_args: dict, session_args: dict):
+    def init(
+        self,
+        host: str,
+        engine_args: dict,
+        session_args: dict,
+        replicas: list[str] | None = None,
+        balance: Literal["round_robin", "least_loaded"] = "round_robin",
+        cooldown: float = 5.0,
+        read_session_class: type[AsyncSession] = AsyncSession,
+    ):
         self._engine = create_async_engine(host, future=True, **engine_args)
         self._sessionmaker = async_sessionmaker(
             autocommit=False, bind=self._engine, class_=AsyncSession, **session_args
         )
+        # write handlers keep one transaction, only the read sessions may release early
+        self._read_sessionmaker = async_sessionmaker(
+            autocommit=False, bind=self._engine, class_=read_session_class, **session_args
+        )
+        telemetry.instrument(self._engine.sync_engine)
+        # every replica gets a pool of its own, sized like the primary's
+        engines = [create_async_engine(url, future=True, **engine_args) for url in replicas or []]
+        self._replicas = ReplicaSet(engines, balance, cooldown)
+        for index, engine in enumerate(engines):
+            telemetry.instrument(engine.sync_engine, f"{engine.url.drivername}/replica{index}")
 
     async def close(self):
         if self._engine is None:
             raise Exception("DatabaseSessionManager is not initialized")
         await self._engine.dispose()
+        await self._replicas.dispose()
         self._engine = None
         self._sessionmaker = None
+        self._read_sessionmaker = None
+        self._replicas = ReplicaSet([])
+
+    def pool_stats(self) -> dict[str, int]:
+        if self._engine is None:
+            raise Exception("DatabaseSessionManager is not initialized")
+        pool = self._engine.pool
+        return {
+            "size": pool.size(),  # type: ignore[attr-defined]
+            "checked_in": pool.checkedin(),  # type: ignore[attr-defined]
+            "checked_out": pool.checkedout(),  # type: ignore[attr-defined]
+            "overflow": pool.overflow(),  # type: ignore[attr-defined]
+        }
+
+    async def validate_idle(self) -> int:
+        """
+        Ping every idle pooled connection once and invalidate the dead ones, the
+        background counterpart of pool_pre_ping. Returns how many were dropped.
+        """
+        if self._engine is None:
+            raise Exception("DatabaseSessionManager is not initialized")
+        dropped = 0
+        for engine in (self._engine, *self._replicas.engines):
+            # the pool hands out idle connections first in, first out: one checkout
+            # at a time visits each of them
+            for _ in range(engine.pool.checkedin()):  # type: ignore[attr-defined]
+                async with engine.connect() as connection:
+                    try:
+                        await connection.run_sync(
+                            lambda sync: sync.dialect.do_ping(sync.connection.dbapi_connection)
+                        )
+                    except Exception:
+                        await connection.invalidate()
+                        dropped += 1
+        return dropped
 
     @contextlib.asynccontextmanager
     async def connect(self) -> AsyncIterator[AsyncConnection]:
@@ -58,6 +135,71 @@ class AsyncDatabaseSessionManager:
         finally:
             await session.close()
 
+    @contextlib.asynccontextmanager
+    async def read_session(self, primary: bool = False) -> AsyncIterator[AsyncSession]:
+        """
+        A session for reads only, bound to a replica unless `primary` is set or none is
+        configured and healthy. It connects lazily, `retry_read` moves it over to the
+        primary when the replica turns out to be unreachable.
+        """
+        if self._read_sessionmaker is None:
+            raise Exception("DatabaseSessionManager is not initialized")
+
+        engine = None if primary else self._replicas.pick()
+        maker = self._read_sessionmaker
+        session = maker() if engine is None else maker(bind=engine)
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+
+    async def gather_reads(
+        self,
+        reads: Sequence[Callable[[AsyncSession], Awaitable[Any]]],
+        timeout: float | None = None,
+        width: int = 3,
+        primary: bool = False,
+    ) -> list[Any]:
+        """
+        Run independent, idempotent reads concurrently, each on a read session and so a
+        pooled connection of its own, and return their results in order. At most `width`
+        of them hold a connection at a time, so one request can not drain the pool, and
+        all of them share one `timeout`: past it, or once one read failed, the others are
+        cancelled, which cancels their running statements, and the error is raised.
+        """
+        if self._sessionmaker is None:
+            raise Exception("DatabaseSessionManager is not initialized")
+
+        slots = asyncio.Semaphore(width)
+
+        async def run(read: Callable[[AsyncSession], Awaitable[Any]]) -> Any:
+            async with slots, self.read_session(primary) as session:
+                return await retry_read(session, lambda: read(session))
+
+        tasks = [asyncio.ensure_future(run(read)) for read in reads]
+        try:
+            return await asyncio.wait_for(asyncio.gather(*tasks), timeout)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    def reads_primary(self, session: AsyncSession) -> bool:
+        return session.bind not in self._replicas.engines
+
+    def fail_over(self, session: AsyncSession) -> bool:
+        """Rebind a read session from its failed replica to the primary, False if it has none."""
+        if self._engine is None or session.bind not in self._replicas.engines:
+            return False
+        self._replicas.mark_down(session.bind)  # type: ignore[arg-type]
+        session.bind = self._engine
+        session.sync_session.bind = self._engine.sync_engine
+        return True
+
     async def create_all(self, connection: AsyncConnection):
         await connection.run_sync(Base.metadata.create_all)
 
@@ -68,9 +210,65 @@ class AsyncDatabaseSessionManager:
 asyncsessionmanager = AsyncDatabaseSessionManager()
 
 
+async def copy_records(
+    session: AsyncSession, table: str, columns: list[str], records: Iterable[tuple[Any, ...]]
+):
+    """
+    Write rows with asyncpg's binary COPY on the connection of the session transaction.
+    The SQLAlchemy adapter opens the asyncpg transaction lazily, so the session must have
+    executed a statement before, otherwise COPY would commit on its own.
+    """
+    connection = await session.connection()
+    raw = await connection.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(table, records=records, columns=columns)
+
+
 async def get_async_db():
     async with asyncsessionmanager.session() as session:
         yield session
 
 
 AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_db)]
+
+
+async def get_async_read_db(request: Request):
+    async with asyncsessionmanager.read_session(STICKY_COOKIE in request.cookies) as session:
+        yield session
+
+
+# GET handlers only: reads may go to a replica and lag behind the primary
+AsyncReadSessionDep = Annotated[AsyncSession, Depends(get_async_read_db)]
+
+
+async def retry_read(
+    session: AsyncSession, read: Callable[[], Awaitable[T]], retries: int = 1
+) -> T:
+    """
+    Run an idempotent read again on a fresh connection when the first one turned out
+    to be dead, e.g. after a database restart without pool_pre_ping, or on the primary
+    when the replica of a read session can not be reached.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return await read()
+        except (DBAPIError, OSError) as error:
+            if attempt == retries or _cancelled(error):
+                raise
+            # asyncpg raises a plain OSError when it can not connect at all
+            invalidated = getattr(error, "connection_invalidated", False)
+            unreachable = invalidated or isinstance(error, (InterfaceError, OSError))
+            if unreachable and asyncsessionmanager.fail_over(session):
+                await session.rollback()
+                continue
+            if not invalidated:
+                raise
+            await session.rollback()
+    raise AssertionError("unreachable")
+
+
+def _cancelled(error: Exception) -> bool:
+    # a timeout (an OSError since 3.11) or a cancelled statement says nothing about the
+    # server being reachable, and running it again would only double its cost
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return True
+    return getattr(getattr(error, "orig", None), "sqlstate", None) == QUERY_CANCELED
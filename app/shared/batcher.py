@@ -0,0 +1,114 @@
+import asyncio
+import contextlib
+import logging
+import time
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+from .async_database import asyncsessionmanager
+from .queries import toys_from_rows, upsert_toys
+from .schema import ToyDTO
+from .telemetry import BatchTelemetry, telemetry
+
+logger = logging.getLogger(__name__)
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class WriteBatcher(Generic[K, V]):
+    """
+    Group concurrent single row writes into one statement and one commit. A batch is
+    flushed once it holds `max_size` items or its first item waited `max_delay`
+    seconds; `submit` returns once that batch is committed, so every caller still gets
+    a durable acknowledgement. Batches are flushed one at a time, items arriving during
+    a flush make up the next one.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flush: Callable[[list[K]], Awaitable[dict[K, V]]] | None = None
+        self._pending: list[tuple[K, asyncio.Future, float]] = []
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(
+        self, flush: Callable[[list[K]], Awaitable[dict[K, V]]], max_size: int, max_delay: float
+    ) -> None:
+        self._flush = flush
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._ready = asyncio.Event()
+        self._full = asyncio.Event()
+        self._closing = False
+        self._stats = telemetry.batches[self.name] = BatchTelemetry(max_size, max_delay)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush what is pending without waiting for the delay, then stop."""
+        if self._task is None:
+            return
+        self._closing = True
+        self._ready.set()
+        self._full.set()
+        await self._task
+        self._task = None
+
+    async def submit(self, item: K) -> V:
+        if self._task is None or self._closing:
+            raise Exception("WriteBatcher is not started")
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future, time.perf_counter()))
+        self._ready.set()
+        if len(self._pending) >= self.max_size:
+            self._full.set()
+        # a cancelled caller leaves its row in the batch, it is written anyway
+        return await future
+
+    async def _run(self) -> None:
+        while True:
+            await self._ready.wait()
+            if not self._pending:
+                return  # woken up by stop()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._full.wait(), self.max_delay)
+            await self._flush_next()
+
+    async def _flush_next(self) -> None:
+        batch, self._pending = self._pending[: self.max_size], self._pending[self.max_size :]
+        if not self._closing:
+            if not self._pending:
+                self._ready.clear()
+            if len(self._pending) < self.max_size:
+                self._full.clear()
+        start = time.perf_counter()
+        try:
+            results = await self._flush([item for item, _, _ in batch])  # type: ignore[misc]
+        except Exception as error:
+            logger.exception("%s batch of %d failed", self.name, len(batch))
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        now = time.perf_counter()
+        self._stats.rows.observe(len(batch))
+        self._stats.flush.observe(now - start)
+        for item, future, submitted_at in batch:
+            self._stats.wait.observe(now - submitted_at)
+            if not future.done():
+                future.set_result(results[item])
+
+
+async def insert_toys(names: list[str]) -> dict[str, ToyDTO]:
+    # ON CONFLICT can not touch the same row twice within a statement
+    unique = list(dict.fromkeys(names))
+    async with asyncsessionmanager.session() as session:
+        result = await session.execute(upsert_toys(), [{"name": name} for name in unique])
+        toys = {toy.name: toy for toy in toys_from_rows(result.all())}
+        await session.commit()
+    return toys
+
+
+toybatcher: WriteBatcher[str, ToyDTO] = WriteBatcher("toys")
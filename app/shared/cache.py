@@ -0,0 +1,104 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable
+from uuid import UUID
+
+from .schema import ToyDTO
+from .telemetry import telemetry
+
+
+class CacheBackend(ABC):
+    """
+    Storage used by `ToyCache`. Async so a shared backend (e.g. redis) can stand in for
+    `LocalCache` when several workers must see the same entries; such a backend is in
+    charge of serializing the stored DTOs.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Any | None: ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any) -> None: ...
+
+
+class LocalCache(CacheBackend):
+    """In-process LRU with a per entry TTL, also a fake backend for tests."""
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get(self, key: str) -> Any | None:
+        entry = self._data.get(key)
+        if entry is None or entry[0] < self._clock():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    async def set(self, key: str, value: Any) -> None:
+        self._data[key] = (self._clock() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class ToyCache:
+    """
+    Read-through cache of `ToyDTO` by id and by name, disabled until `init`. The app
+    only ever inserts toys and every write path puts the toys it wrote, so there is
+    nothing to invalidate: a row changed behind the app's back stays cached until its
+    TTL runs out.
+    """
+
+    def __init__(self):
+        self._backend: CacheBackend | None = None
+
+    def init(self, backend: CacheBackend):
+        self._backend = backend
+        telemetry.toy_cache = backend
+
+    def close(self):
+        self._backend = None
+        telemetry.toy_cache = None
+
+    @property
+    def backend(self) -> CacheBackend | None:
+        return self._backend
+
+    async def by_id(self, id: UUID) -> ToyDTO | None:
+        if self._backend is None:
+            return None
+        return await self._backend.get(f"toy:id:{id}")
+
+    async def by_name(self, name: str) -> ToyDTO | None:
+        if self._backend is None:
+            return None
+        return await self._backend.get(f"toy:name:{name}")
+
+    async def put(self, toy: ToyDTO) -> None:
+        if self._backend is None:
+            return
+        await self._backend.set(f"toy:id:{toy.id}", toy)
+        await self._backend.set(f"toy:name:{toy.name}", toy)
+
+
+toycache = ToyCache()
@@ -1,12 +1,19 @@
 import contextlib
-from typing import Annotated
+from typing import Annotated, Callable, TypeVar
 
+from anyio import to_thread
 from fastapi import Depends
 from sqlalchemy import Engine, create_engine, Connection
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import declarative_base, Session, sessionmaker
 
+from .deadlines import track_connections
+from .telemetry import telemetry
+
 Base = declarative_base()
 
+T = TypeVar("T")
+
 
 class DatabaseSessionManager:
     def __init__(self):
@@ -18,6 +25,8 @@ class DatabaseSessionManager:
         self._sessionmaker = sessionmaker(
             autocommit=False, bind=self._engine, class_=Session, **session_args
         )
+        telemetry.instrument(self._engine)
+        track_connections(self._engine)
 
     def close(self):
         if self._engine is None:
@@ -26,6 +35,36 @@ class DatabaseSessionManager:
         self._engine = None
         self._sessionmaker = None
 
+    def pool_stats(self) -> dict[str, int]:
+        if self._engine is None:
+            raise Exception("DatabaseSessionManager is not initialized")
+        pool = self._engine.pool
+        return {
+            "size": pool.size(),  # type: ignore[attr-defined]
+            "checked_in": pool.checkedin(),  # type: ignore[attr-defined]
+            "checked_out": pool.checkedout(),  # type: ignore[attr-defined]
+            "overflow": pool.overflow(),  # type: ignore[attr-defined]
+        }
+
+    def validate_idle(self) -> int:
+        """
+        Ping every idle pooled connection once and invalidate the dead ones, the
+        background counterpart of pool_pre_ping. Returns how many were dropped.
+        """
+        if self._engine is None:
+            raise Exception("DatabaseSessionManager is not initialized")
+        dropped = 0
+        # the pool hands out idle connections first in, first out: one checkout at a
+        # time visits each of them
+        for _ in range(self._engine.pool.checkedin()):  # type: ignore[attr-defined]
+            with self._engine.connect() as connection:
+                try:
+                    connection.dialect.do_ping(connection.connection.dbapi_connection)
+                except Exception:
+                    connection.invalidate()
+                    dropped += 1
+        return dropped
+
     @contextlib.contextmanager
     def connect(self):
         if self._engine is None:
@@ -68,3 +107,29 @@ def get_db():
 
 
 SessionDep = Annotated[Session, Depends(get_db)]
+
+
+def retry_read(session: Session, read: Callable[[], T], retries: int = 1) -> T:
+    """
+    Run an idempotent read again on a fresh connection when the first one turned out
+    to be dead, e.g. after a database restart without pool_pre_ping.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return read()
+        except DBAPIError as error:
+            if not error.connection_invalidated or attempt == retries:
+                raise
+            session.rollback()
+    raise AssertionError("unreachable")
+
+
+def thread_stats() -> dict[str, int]:
+    # the default anyio limiter runs every sync handler, dependency and stream iteration
+    limiter = to_thread.current_default_thread_limiter()
+    stats = limiter.statistics()
+    return {
+        "threads": int(limiter.total_tokens),
+        "threads_busy": stats.borrowed_tokens,
+        "threads_waiting": stats.tasks_waiting,
+    }
@@ -0,0 +1,117 @@
+import asyncio
+import contextlib
+import logging
+from contextvars import ContextVar
+from http import HTTPStatus
+from typing import Any, Callable, Coroutine
+
+from anyio import CapacityLimiter, to_thread
+from fastapi import HTTPException
+from fastapi.routing import APIRoute
+from sqlalchemy import Engine, event
+from starlette.requests import Request
+from starlette.responses import Response
+
+from ..settings import settings
+
+logger = logging.getLogger(__name__)
+
+# nginx's "client closed request", never seen by the client that is gone
+CLIENT_CLOSED_REQUEST = 499
+
+# DBAPI connections checked out by the sync stack on behalf of the current request
+request_connections: ContextVar[set[Any] | None] = ContextVar("request_connections", default=None)
+
+# cancelling must not queue behind the worker threads it is meant to free
+_cancel_limiter = CapacityLimiter(4)
+
+
+def track_connections(engine: Engine) -> None:
+    """
+    Record the connections a request holds, so `cancel_statements` can reach them. The
+    pool events run in the worker thread of the request, which shares its context.
+    """
+
+    def on_checkout(dbapi_connection, record, proxy) -> None:
+        connections = request_connections.get()
+        if connections is not None:
+            connections.add(dbapi_connection)
+
+    def on_checkin(dbapi_connection, record) -> None:
+        connections = request_connections.get()
+        if connections is not None:
+            connections.discard(dbapi_connection)
+
+    event.listen(engine.pool, "checkout", on_checkout)
+    event.listen(engine.pool, "checkin", on_checkin)
+
+
+async def cancel_statements(connections: set[Any]) -> None:
+    # psycopg and psycopg2 send a cancel request over a side channel, safe from any thread
+    for connection in list(connections):
+        try:
+            await to_thread.run_sync(connection.cancel, limiter=_cancel_limiter)
+        except Exception:
+            logger.exception("could not cancel the running statement")
+
+
+async def _disconnected(request: Request) -> None:
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+async def stop(endpoint: asyncio.Future, connections: set[Any]) -> None:
+    while not endpoint.done():
+        if not connections:
+            endpoint.cancel()
+            break
+        # Cancelling the task of a sync endpoint would close its session on the event
+        # loop, blocked behind the statement still running in the worker thread: cancel
+        # the statement and let the thread unwind, again should it start another one.
+        await cancel_statements(connections)
+        await asyncio.wait((endpoint,), timeout=0.1)
+    with contextlib.suppress(BaseException):
+        await endpoint
+
+
+class DeadlineRoute(APIRoute):
+    """
+    Run the endpoint under the deadline of its handler (ROUTE_DEADLINES, REQUEST_DEADLINE
+    otherwise) and cancel it once the deadline passed, answering 504, or once the client
+    disconnected. Cancelling an async endpoint cancels its running statement through the
+    driver; a sync endpoint keeps its worker thread, see `stop`.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+        deadline = settings.route_deadlines.get(self.name, settings.REQUEST_DEADLINE)
+
+        async def run(request: Request) -> Response:
+            # read the body first, afterwards the only message left is the disconnect
+            await request.body()
+            connections: set[Any] = set()
+            token = request_connections.set(connections)
+            try:
+                endpoint = asyncio.ensure_future(handler(request))
+            finally:
+                request_connections.reset(token)
+            watcher = asyncio.ensure_future(_disconnected(request))
+            try:
+                done, _ = await asyncio.wait(
+                    (endpoint, watcher),
+                    timeout=deadline or None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+            finally:
+                watcher.cancel()
+                await stop(endpoint, connections)
+            if endpoint in done:
+                return endpoint.result()
+            if watcher in done:
+                return Response(status_code=CLIENT_CLOSED_REQUEST)
+            raise HTTPException(
+                status_code=HTTPStatus.GATEWAY_TIMEOUT,
+                detail=f"request exceeded its deadline of {deadline}s",
+            )
+
+        return run
@@ -0,0 +1,19 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+async def watch_pool(validate: Callable[[], Awaitable[int]], interval: float) -> None:
+    """Validate the idle pooled connections every `interval` seconds until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            dropped = await validate()
+        except Exception:
+            # the database may be down right now, the next round tries again
+            logger.exception("idle connection validation failed")
+            continue
+        if dropped:
+            logger.warning("dropped %d dead pooled connections", dropped)
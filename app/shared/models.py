@@ -5,11 +5,16 @@ from sqlalchemy.orm import (
     Mapped,
     mapped_column,
 )
-from sqlalchemy import UUID, Column, DateTime, ForeignKey, Table, func
+from sqlalchemy import UUID, Column, DateTime, ForeignKey, Index, Table, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
+from .ids import new_id
+
 
 class Base(DeclarativeBase):
+    # server generated columns come back through RETURNING on the INSERT itself,
+    # so a freshly flushed object never needs a refresh
+    __mapper_args__ = {"eager_defaults": True}
 
     created_at: Mapped[datetime] = mapped_column(server_default=func.now())
     updated_on: Mapped[datetime] = mapped_column(
@@ -23,25 +28,32 @@ class Base(DeclarativeBase):
 user_toy_association = Table(
     "user_toy",
     Base.metadata,
-    Column("users_id", UUID(as_uuid=True), ForeignKey("users.id")),
-    Column("toys_id", UUID(as_uuid=True), ForeignKey("toys.id")),
+    Column("users_id", UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True),
+    Column("toys_id", UUID(as_uuid=True), ForeignKey("toys.id"), primary_key=True),
+    # the primary key serves the lookups by user, e.g. the selectin load of
+    # UserModel.toys, this index the ones by toy
+    Index("ix_user_toy_toys_id", "toys_id", "users_id"),
 )
 
 
 class ToyModel(Base):
     __tablename__ = "toys"
+    # keyset pagination key, see app/shared/pagination.py
+    __table_args__ = (Index("ix_toys_created_at_id", "created_at", "id"),)
 
     id: Mapped[uuid.uuid4] = mapped_column(  # type: ignore
-        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True
+        UUID(as_uuid=True), primary_key=True, default=new_id, unique=True
     )
-    name: Mapped[str] = mapped_column(nullable=False)
+    # unique index ix_toys_name is the conflict target of the toy upsert
+    name: Mapped[str] = mapped_column(nullable=False, unique=True, index=True)
 
 
 class UserModel(Base):
     __tablename__ = "users"
+    __table_args__ = (Index("ix_users_created_at_id", "created_at", "id"),)
 
     id: Mapped[uuid.uuid4] = mapped_column(  # type: ignore
-        UUID(as_uuid=True), unique=True, primary_key=True, default=uuid.uuid4
+        UUID(as_uuid=True), unique=True, primary_key=True, default=new_id
     )
     name: Mapped[str] = mapped_column(nullable=False)
     toys: Mapped[list["ToyModel"]] = relationship(
@@ -0,0 +1,72 @@
+import base64
+import binascii
+from datetime import datetime
+from http import HTTPStatus
+from typing import Annotated, Any, Optional, Sequence
+from uuid import UUID
+
+import orjson
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy import Select, tuple_
+
+from ..settings import settings
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+LimitQuery = Annotated[
+    int,
+    Query(ge=1, le=settings.PAGE_MAX_LIMIT, description="max number of items per page"),
+]
+AfterQuery = Annotated[
+    Optional[str],
+    Query(description="cursor returned as `next` by the previous page"),
+]
+StreamQuery = Annotated[
+    bool,
+    Query(description="stream every item after the cursor as NDJSON instead of a page"),
+]
+
+
+def encode_cursor(created_at: datetime, id: UUID) -> str:
+    raw = f"{created_at.isoformat()}|{id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        created_at, id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), UUID(id)
+    except (ValueError, binascii.Error):
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST, detail=f"invalid cursor: {cursor}"
+        )
+
+
+def keyset(stmt: Select, model: Any, after: str | None) -> Select:
+    # (created_at, id) is unique and indexed, so every page is an index range scan
+    # instead of an OFFSET that reads and discards all the previous rows.
+    stmt = stmt.order_by(model.created_at, model.id)
+    if after:
+        stmt = stmt.where(tuple_(model.created_at, model.id) > decode_cursor(after))
+    return stmt
+
+
+def paginate(stmt: Select, model: Any, limit: int, after: str | None) -> Select:
+    # one extra row tells whether there is a next page without a COUNT(*)
+    return keyset(stmt, model, after).limit(limit + 1)
+
+
+def next_cursor(rows: Sequence[Any], limit: int) -> tuple[Sequence[Any], str | None]:
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last.created_at, last.id)
+
+
+def ndjson_line(dto: Any) -> bytes:
+    if isinstance(dto, BaseModel):
+        return dto.model_dump_json().encode() + b"\n"
+    # response records
+    return orjson.dumps(dto, default=str, option=orjson.OPT_APPEND_NEWLINE)
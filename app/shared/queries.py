@@ -0,0 +1,94 @@
+from typing import Any, Sequence
+
+from pydantic import TypeAdapter
+from sqlalchemy import JSON, Insert, Row, Select, func, literal_column, select
+from sqlalchemy.dialects import postgresql
+
+from .models import ToyModel, UserModel, user_toy_association
+from .schema import ToyDTO, UserDTO
+
+toys_table = ToyModel.__table__.c
+toys_adapter = TypeAdapter(list[ToyDTO])
+
+
+# Core fast path: plain Row tuples skip the identity map and instance state of the ORM.
+def select_toys() -> Select:
+    return select(toys_table.id, toys_table.name, toys_table.created_at)
+
+
+def toys_from_rows(rows: Sequence[Row]) -> list[ToyDTO]:
+    # one call into pydantic-core for the whole list, from plain dicts, is cheaper than
+    # from_attributes lookups and than model_construct on every row
+    return toys_adapter.validate_python([row._asdict() for row in rows])
+
+
+# Idempotent toy creation in one round trip, race free thanks to the unique ix_toys_name.
+# DO UPDATE instead of DO NOTHING because only then RETURNING yields the existing row.
+# Executed with a list of parameters it is batched by insertmanyvalues, rows coming back
+# in parameter order; a name must appear only once per statement.
+def upsert_toys() -> Insert:
+    stmt = postgresql.insert(ToyModel)
+    return stmt.on_conflict_do_update(
+        index_elements=[ToyModel.name], set_={"name": stmt.excluded.name}
+    ).returning(toys_table.id, toys_table.name, sort_by_parameter_order=True)
+
+
+def upsert_toy(name: str) -> Insert:
+    return upsert_toys().values(name=name)
+
+
+# Aggregated user loader: the toys of each user travel as a json array built by a
+# correlated subquery, replacing the second IN-query issued by the selectin relationship.
+# Being evaluated per returned row, it only aggregates the users of the requested page,
+# each one through the user_toy (users_id, toys_id) primary key.
+def select_users_with_toys() -> Select:
+    toys = (
+        select(
+            func.coalesce(
+                func.json_agg(func.json_build_object("id", ToyModel.id, "name", ToyModel.name)),
+                literal_column("'[]'::json"),
+                type_=JSON,
+            )
+        )
+        .select_from(user_toy_association)
+        .join(ToyModel, ToyModel.id == user_toy_association.c.toys_id)
+        .where(user_toy_association.c.users_id == UserModel.id)
+        .scalar_subquery()
+    )
+    return select(UserModel.id, UserModel.name, UserModel.created_at, toys.label("toys"))
+
+
+def select_user_toys(id: Any) -> Select:
+    return (
+        select_toys()
+        .join(user_toy_association, user_toy_association.c.toys_id == ToyModel.id)
+        .where(user_toy_association.c.users_id == id)
+        .order_by(ToyModel.name)
+    )
+
+
+def count_co_owners(id: Any) -> Select:
+    owned = select(user_toy_association.c.toys_id).where(user_toy_association.c.users_id == id)
+    return select(func.count(func.distinct(user_toy_association.c.users_id))).where(
+        user_toy_association.c.toys_id.in_(owned),
+        user_toy_association.c.users_id != id,
+    )
+
+
+class UserHydrator:
+    """
+    Build `UserDTO` straight from `select_users_with_toys` rows, sharing one `ToyDTO`
+    per toy id across every user of the result.
+    """
+
+    def __init__(self):
+        self._toys: dict[str, ToyDTO] = {}
+
+    def toy(self, data: dict[str, Any]) -> ToyDTO:
+        toy = self._toys.get(data["id"])
+        if toy is None:
+            toy = self._toys[data["id"]] = ToyDTO(**data)
+        return toy
+
+    def __call__(self, row: Row) -> UserDTO:
+        return UserDTO(id=row.id, name=row.name, toys=[self.toy(t) for t in row.toys])
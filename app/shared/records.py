@@ -0,0 +1,56 @@
+from dataclasses import dataclass
+from typing import Any, Optional
+from uuid import UUID
+
+from sqlalchemy import Row
+
+# Response records for rows read from our own database: slotted dataclasses skip the
+# pydantic validation and the per instance __dict__ of the DTOs, and orjson encodes them
+# natively. Handlers keep their DTO return annotations, so the OpenAPI schema is the same;
+# without ORJSON_RESPONSES FastAPI converts them back through the response model.
+
+
+@dataclass(slots=True)
+class ToyRecord:
+    id: UUID | str
+    name: str
+
+
+@dataclass(slots=True)
+class UserRecord:
+    id: UUID
+    name: str
+    toys: list[ToyRecord]
+
+
+@dataclass(slots=True)
+class PageRecord:
+    items: list[Any]
+    next: Optional[str] = None
+
+
+def toy_record(toy: Any) -> ToyRecord:
+    # a Row of select_toys or a ToyModel
+    return ToyRecord(toy.id, toy.name)
+
+
+def user_record(user: Any) -> UserRecord:
+    # a UserModel with its toys loaded
+    return UserRecord(user.id, user.name, [ToyRecord(toy.id, toy.name) for toy in user.toys])
+
+
+class UserRecordHydrator:
+    """`UserHydrator` counterpart, one `ToyRecord` per toy id across the result."""
+
+    def __init__(self):
+        self._toys: dict[str, ToyRecord] = {}
+
+    def toy(self, data: dict[str, Any]) -> ToyRecord:
+        toy = self._toys.get(data["id"])
+        if toy is None:
+            # json_agg ids are strings already, they are written out as they are
+            toy = self._toys[data["id"]] = ToyRecord(data["id"], data["name"])
+        return toy
+
+    def __call__(self, row: Row) -> UserRecord:
+        return UserRecord(row.id, row.name, [self.toy(t) for t in row.toys])
@@ -0,0 +1,71 @@
+import itertools
+import time
+from typing import Literal
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# set on the responses of successful writes, reads of that client go to the primary
+# while it lives so they see their own writes despite the replication lag
+STICKY_COOKIE = "db_primary"
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class ReplicaSet:
+    """
+    Engines of the read replicas, picked round-robin or by fewest checked out
+    connections. A replica that failed to hand out a connection sits out `cooldown`
+    seconds.
+    """
+
+    def __init__(
+        self,
+        engines: list[AsyncEngine],
+        balance: Literal["round_robin", "least_loaded"] = "round_robin",
+        cooldown: float = 5.0,
+    ):
+        self.engines = engines
+        self.balance = balance
+        self.cooldown = cooldown
+        self._down_until = [0.0] * len(engines)
+        self._turn = itertools.count()
+
+    def pick(self) -> AsyncEngine | None:
+        now = time.monotonic()
+        healthy = [
+            engine for engine, until in zip(self.engines, self._down_until) if until <= now
+        ]
+        if not healthy:
+            return None
+        if self.balance == "least_loaded":
+            return min(healthy, key=lambda engine: engine.pool.checkedout())  # type: ignore[attr-defined]
+        return healthy[next(self._turn) % len(healthy)]
+
+    def mark_down(self, engine: AsyncEngine) -> None:
+        self._down_until[self.engines.index(engine)] = time.monotonic() + self.cooldown
+
+    async def dispose(self) -> None:
+        for engine in self.engines:
+            await engine.dispose()
+
+
+class StickyWritesMiddleware:
+    """Set the `STICKY_COOKIE` for `max_age` seconds on every successful write."""
+
+    def __init__(self, app: ASGIApp, max_age: int):
+        self.app = app
+        self.cookie = f"{STICKY_COOKIE}=1; Max-Age={max_age}; Path=/; HttpOnly; SameSite=Lax"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                headers = message.setdefault("headers", [])
+                headers.append((b"set-cookie", self.cookie.encode()))
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
@@ -0,0 +1,35 @@
+from http import HTTPStatus
+from typing import Any
+from uuid import UUID
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+from ..settings import settings
+
+
+def _default(obj: Any) -> Any:
+    # asyncpg returns its own UUID subclass, orjson only encodes uuid.UUID natively
+    if isinstance(obj, UUID):
+        return str(obj)
+    raise TypeError
+
+
+class DTOResponse(ORJSONResponse):
+    def render(self, content: Any) -> bytes:
+        # python mode keeps UUID and datetime objects, orjson encodes them natively, as
+        # well as the dataclasses of the response records
+        if isinstance(content, BaseModel):
+            content = content.model_dump()
+        elif isinstance(content, list):
+            content = [i.model_dump() if isinstance(i, BaseModel) else i for i in content]
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def respond(dto: Any, status_code: int = HTTPStatus.OK) -> Any:
+    # a returned Response skips FastAPI's response_model validation and serialization,
+    # the annotated return type still documents the endpoint in the OpenAPI schema
+    if settings.ORJSON_RESPONSES:
+        return DTOResponse(dto, status_code=status_code)
+    return dto
@@ -1,5 +1,5 @@
 from uuid import UUID
-from typing import Optional
+from typing import Generic, Optional, TypeVar
 from pydantic import BaseModel, Field
 
 
@@ -29,6 +29,31 @@ class UserDTO(BaseModel):
     class Config:
         from_attributes = True
 
+
+class UserSummaryDTO(UserDTO):
+    toy_count: int
+    co_owners: int = Field(description="other users owning at least one of these toys")
+
+
+class PopularToyDTO(ToyDTO):
+    owners: int
+
+
+class UserToyCountDTO(BaseModel):
+    id: UUID
+    toys: int
+
+
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    items: list[T]
+    next: Optional[str] = Field(
+        default=None, description="cursor to be sent as `after` to fetch the next page"
+    )
+
+
 class AssociateUserToysRequest(BaseModel):
     user_id: UUID
     toys: list[UUID] = Field(min_length=1)
@@ -0,0 +1,105 @@
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy.orm import Session, SessionTransaction, SessionTransactionOrigin
+
+# session.info key set once the current transaction may hold writes or locks
+PINNED = "pinned"
+
+
+class ReleasingSyncSession(Session):
+    pass
+
+
+@event.listens_for(ReleasingSyncSession, "after_flush")
+def _pin_flush(session: Session, context: Any):
+    session.info[PINNED] = True
+
+
+@event.listens_for(ReleasingSyncSession, "after_transaction_end")
+def _unpin(session: Session, transaction: SessionTransaction):
+    if transaction.parent is None:
+        session.info.pop(PINNED, None)
+
+
+def _writes(statement: Any) -> bool:
+    # anything but a plain SELECT: DML, text, or a SELECT ... FOR UPDATE holding locks
+    locking = getattr(statement, "_for_update_arg", None) is not None
+    return not getattr(statement, "is_select", False) or locking
+
+
+class ReleasingSession(AsyncSession):
+    """
+    An AsyncSession for the read sessions that hands its connection back to the pool
+    right after each read, instead of holding it until the session is closed at
+    dependency teardown, i.e. after the response is serialized. The connection is
+    still checked out lazily on the first statement.
+
+    A read ends the transaction the session began on its own by committing it, without
+    expiring the loaded objects, so every read runs in a transaction of its own and
+    two reads of a handler may see different snapshots. Once a transaction wrote,
+    flushed, locked rows or handed its connection out, it is kept until the handler
+    commits, as with a plain AsyncSession. `stream` keeps its connection until the
+    stream is closed.
+    """
+
+    sync_session_class = ReleasingSyncSession
+
+    # writes and locks are told apart here rather than in a do_orm_execute hook: any
+    # listener of that event breaks yield_per streams with selectin loaders
+
+    async def execute(self, statement: Any, *args: Any, **kwargs: Any) -> Any:
+        if _writes(statement):
+            self.info[PINNED] = True
+        result = await super().execute(statement, *args, **kwargs)  # buffered, prebuffer_rows
+        await self.release()
+        return result
+
+    async def scalar(self, statement: Any, *args: Any, **kwargs: Any) -> Any:
+        if _writes(statement):
+            self.info[PINNED] = True
+        value = await super().scalar(statement, *args, **kwargs)
+        await self.release()
+        return value
+
+    async def get(self, *args: Any, **kwargs: Any) -> Any:
+        if kwargs.get("with_for_update"):
+            self.info[PINNED] = True
+        instance = await super().get(*args, **kwargs)
+        await self.release()
+        return instance
+
+    async def get_one(self, *args: Any, **kwargs: Any) -> Any:
+        if kwargs.get("with_for_update"):
+            self.info[PINNED] = True
+        instance = await super().get_one(*args, **kwargs)
+        await self.release()
+        return instance
+
+    async def refresh(self, *args: Any, **kwargs: Any) -> None:
+        await super().refresh(*args, **kwargs)
+        await self.release()
+
+    async def connection(self, *args: Any, **kwargs: Any) -> AsyncConnection:
+        connection = await super().connection(*args, **kwargs)
+        self.info[PINNED] = True
+        return connection
+
+    async def release(self) -> None:
+        transaction = self.sync_session.get_transaction()
+        if (
+            transaction is None
+            or transaction.origin is not SessionTransactionOrigin.AUTOBEGIN
+            or self.info.get(PINNED)
+            or self.new
+            or self.dirty
+            or self.deleted
+        ):
+            return
+        expire_on_commit = self.sync_session.expire_on_commit
+        self.sync_session.expire_on_commit = False
+        try:
+            await self.commit()
+        finally:
+            self.sync_session.expire_on_commit = expire_on_commit
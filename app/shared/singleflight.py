@@ -0,0 +1,38 @@
+import asyncio
+from functools import partial
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from .telemetry import telemetry
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Share one in-flight call, and its result, between the concurrent callers of the
+    same key. The call runs in a task of its own and every caller waits on it through
+    `asyncio.shield`: a caller going away, e.g. on client disconnect, does not cancel
+    it for the others. Results are shared as they are, they must not be mutated.
+    """
+
+    def __init__(self):
+        self._flights: dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, name: str, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = asyncio.ensure_future(call())
+            self._flights[key] = flight
+            flight.add_done_callback(partial(self._land, key))
+            telemetry.flights[name, "leader"] += 1
+        else:
+            telemetry.flights[name, "follower"] += 1
+        return await asyncio.shield(flight)
+
+    def _land(self, key: Hashable, flight: asyncio.Future) -> None:
+        self._flights.pop(key, None)
+        if not flight.cancelled():
+            flight.exception()  # retrieved even when every caller is gone
+
+
+singleflight = SingleFlight()
@@ -0,0 +1,108 @@
+import asyncio
+import contextlib
+import logging
+import time
+
+from sqlalchemy import UUID, BigInteger, Column, MetaData, String, Table, text
+
+from .async_database import asyncsessionmanager
+
+logger = logging.getLogger(__name__)
+
+# materialized views of alembic revision b41e7d9c3a52 (and toys.sql), kept out of
+# Base.metadata so that create_all never creates them as plain tables
+views = MetaData()
+
+toy_popularity = Table(
+    "toy_popularity",
+    views,
+    Column("toy_id", UUID(as_uuid=True), primary_key=True),
+    Column("name", String),
+    Column("owners", BigInteger),
+)
+
+user_toy_counts = Table(
+    "user_toy_counts",
+    views,
+    Column("user_id", UUID(as_uuid=True), primary_key=True),
+    Column("toys", BigInteger),
+)
+
+
+class StatsRefresher:
+    """
+    Refresh the stats views once at startup, then every `interval` seconds, CONCURRENTLY
+    so that their readers never wait on it. With `on_write` a refresh follows the writes
+    instead: the first write after a refresh starts a countdown of `interval` seconds,
+    0 for none, and the writes landing meanwhile or during the refresh share the next one.
+    """
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+        self._written: asyncio.Event | None = None
+
+    def touch(self) -> None:
+        if self._written is not None:
+            self._written.set()
+
+    def start(self, interval: float, on_write: bool) -> None:
+        # bound to the running loop, hence created here rather than in __init__
+        self._written = asyncio.Event() if on_write else None
+        self._task = asyncio.create_task(self._run(interval))
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        self._written = None
+
+    async def refresh(self) -> None:
+        async with asyncsessionmanager.connect() as connection:
+            # rebuilding a view reads its whole tables, far beyond a request's budget
+            await connection.execute(text("SET LOCAL statement_timeout = 0"))
+            for view in views.sorted_tables:
+                refresh = f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view.name}"
+                await connection.execute(text(refresh))
+
+    async def _refresh(self) -> bool:
+        start = time.perf_counter()
+        try:
+            await self.refresh()
+        except Exception:
+            logger.exception("stats views refresh failed")
+            return False
+        logger.info("refreshed stats views in %.3fs", time.perf_counter() - start)
+        return True
+
+    async def _exists(self) -> bool:
+        async with asyncsessionmanager.connect() as connection:
+            missing = [
+                view.name
+                for view in views.sorted_tables
+                if await connection.scalar(text(f"SELECT to_regclass('{view.name}')")) is None
+            ]
+        if missing:
+            logger.warning("stats views %s missing, run alembic upgrade head", missing)
+        return not missing
+
+    async def _run(self, interval: float) -> None:
+        with contextlib.suppress(Exception):
+            if not await self._exists():
+                return
+        await self._refresh()
+        while True:
+            if self._written is not None:
+                await self._written.wait()
+            await asyncio.sleep(interval)
+            if self._written is not None:
+                # writes landing during the refresh call for another one
+                self._written.clear()
+            if not await self._refresh() and self._written is not None:
+                self._written.set()
+                await asyncio.sleep(max(interval, 1))
+
+
+statsrefresher = StatsRefresher()
@@ -0,0 +1,364 @@
+import bisect
+import logging
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+
+from sqlalchemy import Engine, event
+from sqlalchemy.engine.interfaces import CacheStats
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+SECONDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENTS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+ROWS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = SECONDS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()  # the sync stack observes from worker threads
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+
+    def lines(self, name: str, labels: str) -> Iterable[str]:
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f"{name}_sum{{{labels}}} {self.sum}"
+        yield f"{name}_count{{{labels}}} {cumulative}"
+
+
+class PoolTelemetry:
+    """
+    Pool events of one engine. Checkout wait is the time spent inside the pool's
+    `_do_get`, i.e. queued for a free connection (or opening a new one); hold time runs
+    from checkout to checkin. A failed pre-ping shows up as an invalidation.
+    """
+
+    def __init__(self, engine: Engine):
+        self.pool = engine.pool
+        self.checkout_wait = Histogram()
+        self.hold = Histogram()
+        self.events = {"checkout": 0, "checkin": 0, "connect": 0, "invalidate": 0}
+        for name in self.events:
+            event.listen(self.pool, name, getattr(self, f"_on_{name}"))
+        self._do_get = self.pool._do_get  # type: ignore[attr-defined]
+        self.pool._do_get = self._timed_get  # type: ignore[method-assign]
+
+    def _timed_get(self) -> Any:
+        start = time.perf_counter()
+        try:
+            return self._do_get()
+        finally:
+            self.checkout_wait.observe(time.perf_counter() - start)
+
+    def _on_checkout(self, dbapi_connection, record, proxy) -> None:
+        self.events["checkout"] += 1
+        record.info["checked_out_at"] = time.perf_counter()
+
+    def _on_checkin(self, dbapi_connection, record) -> None:
+        self.events["checkin"] += 1
+        checked_out_at = record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            self.hold.observe(time.perf_counter() - checked_out_at)
+
+    def _on_connect(self, dbapi_connection, record) -> None:
+        self.events["connect"] += 1
+
+    def _on_invalidate(self, dbapi_connection, record, exception) -> None:
+        self.events["invalidate"] += 1
+
+    def gauges(self) -> dict[str, int]:
+        pool: Any = self.pool
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        }
+
+
+class CacheTelemetry:
+    """
+    Hit counts of the engine's compiled SQL cache and, with `prepared`, of the driver's
+    prepared statements: asyncpg through SQLAlchemy's per connection LRU, psycopg
+    through its prepare manager, which drops every prepared statement on ROLLBACK.
+    The latter peeks at private driver state on every statement, hence opt-in.
+    """
+
+    def __init__(self, engine: Engine, prepared: bool = False):
+        self.driver = engine.dialect.driver if prepared else None
+        self.compiled = {"hit": 0, "miss": 0, "uncached": 0}
+        self.prepared = {"hit": 0, "miss": 0} if prepared else {}
+        if self.driver in ("asyncpg", "psycopg"):
+            event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        try:
+            if self.driver == "asyncpg":
+                cache = conn.connection.dbapi_connection._prepared_statement_cache
+                hit = cache is not None and statement in cache
+                self.prepared["hit" if hit else "miss"] += 1
+            elif self.driver == "psycopg":
+                context.prepared_before = self._psycopg_state(conn)
+        except AttributeError:
+            # internals of another driver version: stop probing rather than fail
+            logger.warning("no prepared statement stats for this %s version", self.driver)
+            self.driver = None
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context.cache_hit is CacheStats.CACHE_HIT:
+            self.compiled["hit"] += 1
+        elif context.cache_hit is CacheStats.CACHE_MISS:
+            self.compiled["miss"] += 1
+        else:
+            self.compiled["uncached"] += 1
+        if hasattr(context, "prepared_before"):
+            # psycopg either prepares the statement (new name), counts one more run of
+            # an unprepared statement, or reuses a prepared one leaving both untouched
+            before = context.prepared_before
+            hit = before is not None and self._psycopg_state(conn) == before
+            self.prepared["hit" if hit else "miss"] += 1
+
+    def _psycopg_state(self, conn) -> tuple | None:
+        connection = conn.connection.dbapi_connection
+        # the async dialect wraps the psycopg connection in an adapter
+        manager = getattr(connection, "_connection", connection)._prepared
+        if manager.prepare_threshold is None:
+            return None
+        return manager._prepared_idx, next(reversed(manager._counts.items()), None)
+
+
+@dataclass
+class RequestStats:
+    statements: int = 0
+    rows: int = 0
+    db_time: float = 0.0
+    shapes: Counter[str] = field(default_factory=Counter)
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.db_time * 1000:.3f};'
+            f'desc="{self.statements} statements, {self.rows} rows"'
+        )
+
+
+request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+# Both hooks run in the request context: asyncio greenlets and anyio worker threads
+# inherit it. The SQL text is already parametrized, so it doubles as the statement shape.
+def _before_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.shapes[statement] += 1
+        conn.info.setdefault("stats_started_at", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = request_stats.get()
+    if stats is not None and conn.info.get("stats_started_at"):
+        stats.db_time += time.perf_counter() - conn.info["stats_started_at"].pop()
+        # -1 for server side cursors, whose rows are unknown until fetched
+        stats.rows += max(cursor.rowcount, 0)
+
+
+class RouteTelemetry:
+    def __init__(self):
+        self.statements = Histogram(STATEMENTS)
+        self.db_time = Histogram()
+
+
+class BatchTelemetry:
+    """Rows per flush, flush duration and time from submit to commit of a write batcher."""
+
+    def __init__(self, max_size: int, max_delay: float):
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.rows = Histogram(ROWS)
+        self.flush = Histogram()
+        self.wait = Histogram()
+
+
+class Telemetry:
+    def __init__(self):
+        self.pools: dict[str, PoolTelemetry] = {}
+        self.caches: dict[str, CacheTelemetry] = {}
+        self.routes: dict[tuple[str, str], RouteTelemetry] = {}
+        self.flights: Counter[tuple[str, str]] = Counter()
+        self.batches: dict[str, BatchTelemetry] = {}
+        self.admissions: Counter[tuple[str, str]] = Counter()
+        self.admission: Any = None  # the AdmissionController, when admission control is on
+        self.prepared_stats = False  # DB_PREPARED_STATS, read by `instrument`
+        self.toy_cache: Any = None  # the ToyCache backend, when TOY_CACHE_ENABLED is on
+
+    def instrument(self, engine: Engine, name: str | None = None) -> None:
+        """Register an engine under `name`, its url scheme by default, replacing a previous one."""
+        name = name or engine.url.drivername
+        self.pools[name] = PoolTelemetry(engine)
+        self.caches[name] = CacheTelemetry(engine, self.prepared_stats)
+        event.listen(engine, "before_cursor_execute", _before_execute)
+        event.listen(engine, "after_cursor_execute", _after_execute)
+
+    def observe_request(self, method: str, route: str, stats: RequestStats) -> None:
+        entry = self.routes.get((method, route))
+        if entry is None:
+            entry = self.routes.setdefault((method, route), RouteTelemetry())
+        entry.statements.observe(stats.statements)
+        entry.db_time.observe(stats.db_time)
+
+    def render(self) -> str:
+        lines: list[str] = []
+
+        def header(name: str, kind: str, help: str) -> None:
+            lines.extend((f"# HELP {name} {help}", f"# TYPE {name} {kind}"))
+
+        header("db_pool_events_total", "counter", "pool events by type")
+        for engine, pool in self.pools.items():
+            for name, count in pool.events.items():
+                lines.append(f'db_pool_events_total{{engine="{engine}",event="{name}"}} {count}')
+        for gauge, help in (
+            ("size", "connections kept by the pool"),
+            ("checked_out", "connections in use"),
+            ("overflow", "connections above pool_size, negative while below it"),
+        ):
+            header(f"db_pool_{gauge}", "gauge", help)
+            for engine, pool in self.pools.items():
+                lines.append(f'db_pool_{gauge}{{engine="{engine}"}} {pool.gauges()[gauge]}')
+        for histogram, help in (
+            ("checkout_wait", "time spent waiting for a connection"),
+            ("hold", "time a connection stays checked out"),
+        ):
+            name = f"db_pool_{histogram}_seconds"
+            header(name, "histogram", help)
+            for engine, pool in self.pools.items():
+                lines.extend(getattr(pool, histogram).lines(name, f'engine="{engine}"'))
+        for cache, help in (
+            ("compiled", "executions by compiled SQL cache result"),
+            ("prepared", "executions by prepared statement cache result"),
+        ):
+            name = f"db_{cache}_cache_total"
+            header(name, "counter", help)
+            for engine, caches in self.caches.items():
+                for result, count in getattr(caches, cache).items():
+                    lines.append(f'{name}{{engine="{engine}",result="{result}"}} {count}')
+        for histogram, name, help in (
+            ("statements", "db_statements_per_request", "statements sent per request"),
+            ("db_time", "db_time_per_request_seconds", "time spent in statements per request"),
+        ):
+            header(name, "histogram", help)
+            for (method, route), entry in self.routes.items():
+                labels = f'method="{method}",route="{route}"'
+                lines.extend(getattr(entry, histogram).lines(name, labels))
+        header("db_singleflight_total", "counter", "coalesced reads by route and role")
+        for (route, role), count in self.flights.items():
+            lines.append(f'db_singleflight_total{{route="{route}",role="{role}"}} {count}')
+        for setting, name, help in (
+            ("max_size", "db_batch_max_rows", "rows that trigger a flush"),
+            ("max_delay", "db_batch_max_delay_seconds", "time the first row of a batch waits at most"),
+        ):
+            header(name, "gauge", help)
+            for batcher, batch in self.batches.items():
+                lines.append(f'{name}{{batch="{batcher}"}} {getattr(batch, setting)}')
+        for histogram, name, help in (
+            ("rows", "db_batch_rows", "rows written per flush"),
+            ("flush", "db_batch_flush_seconds", "time to insert and commit a batch"),
+            ("wait", "db_batch_wait_seconds", "time from submit to commit of a row"),
+        ):
+            header(name, "histogram", help)
+            for batcher, batch in self.batches.items():
+                lines.extend(getattr(batch, histogram).lines(name, f'batch="{batcher}"'))
+        header("http_admissions_total", "counter", "admission decisions by lane and outcome")
+        for (lane, outcome), count in self.admissions.items():
+            lines.append(f'http_admissions_total{{lane="{lane}",outcome="{outcome}"}} {count}')
+        if self.admission is not None:
+            header("http_admission_in_flight", "gauge", "admitted requests running")
+            lines.append(f"http_admission_in_flight {self.admission.in_flight}")
+            header("http_admission_queued", "gauge", "requests waiting for admission")
+            for lane, waiters in self.admission.waiters.items():
+                lines.append(f'http_admission_queued{{lane="{lane}"}} {len(waiters)}')
+        stats = getattr(self.toy_cache, "stats", None)
+        if stats is not None:
+            counts = stats()
+            header("toy_cache_size", "gauge", "entries held by the toy cache")
+            lines.append(f"toy_cache_size {counts['size']}")
+            header("toy_cache_total", "counter", "toy cache lookups and evictions by result")
+            for result, key in (("hit", "hits"), ("miss", "misses"), ("eviction", "evictions")):
+                lines.append(f'toy_cache_total{{result="{result}"}} {counts[key]}')
+        return "\n".join(lines) + "\n"
+
+
+telemetry = Telemetry()
+
+
+class RequestStatsMiddleware:
+    """
+    Collect statements, rows and database time of each request: reported back in a
+    `Server-Timing` header, published by route template on /metrics, and logged as a
+    warning when a request exceeds `statement_budget` or sends one statement shape
+    `repeat_threshold` times or more (the N+1 pattern). A threshold of 0 disables it.
+    Statements of a streamed body run after the headers and only reach /metrics.
+    """
+
+    def __init__(self, app: ASGIApp, statement_budget: int = 0, repeat_threshold: int = 0):
+        self.app = app
+        self.statement_budget = statement_budget
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = message.setdefault("headers", [])
+                headers.append((b"server-timing", stats.server_timing().encode()))
+            await send(message)
+
+        token = request_stats.set(stats)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_stats.reset(token)
+            # the router stores the matched route in the scope, unmatched paths are grouped
+            route = scope.get("route")
+            path = getattr(route, "path", "<unmatched>")
+            if path != "/metrics":
+                telemetry.observe_request(scope["method"], path, stats)
+                self.check(scope["method"], path, stats)
+
+    def check(self, method: str, path: str, stats: RequestStats) -> None:
+        if self.statement_budget and stats.statements > self.statement_budget:
+            logger.warning(
+                "%s %s sent %d statements, over the budget of %d",
+                method, path, stats.statements, self.statement_budget,
+            )
+        if self.repeat_threshold and stats.shapes:
+            shape, count = stats.shapes.most_common(1)[0]
+            if count >= max(self.repeat_threshold, 2):
+                logger.warning(
+                    "%s %s sent the same statement %d times: %s",
+                    method, path, count, " ".join(shape.split())[:200],
+                )
+
+
+async def metrics(request: Request) -> Response:
+    return PlainTextResponse(telemetry.render(), media_type=PROMETHEUS_MEDIA_TYPE)
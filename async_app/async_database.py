@@ -11,6 +11,8 @@ from sqlalchemy.ext.asyncio import (
 )
 from sqlalchemy.orm import declarative_base
 
+from app.shared.telemetry import telemetry
+
 Base = declarative_base()
 
 
@@ -18,12 +20,24 @@ class DatabaseSessionManager:
     def __init__(self):
         self._engine: AsyncEngine | None = None
         self._sessionmaker: async_sessionmaker | None = None
-
-    def init(self, host: str, engine_args: dict, session_args: dict):
+        self._read_sessionmaker: async_sessionmaker | None = None
+
+    def init(
+        self,
+        host: str,
+        engine_args: dict,
+        session_args: dict,
+        read_session_class: type[AsyncSession] = AsyncSession,
+    ):
         self._engine = create_async_engine(host, future=True, **engine_args)
         self._sessionmaker = async_sessionmaker(
             autocommit=False, bind=self._engine, class_=AsyncSession, **session_args
         )
+        # write handlers keep one transaction, only the read sessions may release early
+        self._read_sessionmaker = async_sessionmaker(
+            autocommit=False, bind=self._engine, class_=read_session_class, **session_args
+        )
+        telemetry.instrument(self._engine.sync_engine)
 
     async def close(self):
         if self._engine is None:
@@ -31,6 +45,23 @@ class DatabaseSessionManager:
         await self._engine.dispose()
         self._engine = None
         self._sessionmaker = None
+        self._read_sessionmaker = None
+
+    async def validate_idle(self) -> int:
+        """Ping every idle pooled connection once and invalidate the dead ones."""
+        if self._engine is None:
+            raise Exception("DatabaseSessionManager is not initialized")
+        dropped = 0
+        for _ in range(self._engine.pool.checkedin()):  # type: ignore[attr-defined]
+            async with self._engine.connect() as connection:
+                try:
+                    await connection.run_sync(
+                        lambda sync: sync.dialect.do_ping(sync.connection.dbapi_connection)
+                    )
+                except Exception:
+                    await connection.invalidate()
+                    dropped += 1
+        return dropped
 
     @contextlib.asynccontextmanager
     async def connect(self) -> AsyncIterator[AsyncConnection]:
@@ -58,6 +89,20 @@ class DatabaseSessionManager:
         finally:
             await session.close()
 
+    @contextlib.asynccontextmanager
+    async def read_session(self) -> AsyncIterator[AsyncSession]:
+        if self._read_sessionmaker is None:
+            raise Exception("DatabaseSessionManager is not initialized")
+
+        session = self._read_sessionmaker()
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+
     async def create_all(self, connection: AsyncConnection):
         await connection.run_sync(Base.metadata.create_all)
 
@@ -74,3 +119,12 @@ async def get_db():
 
 
 SessionDep = Annotated[AsyncSession, Depends(get_db)]
+
+
+async def get_read_db():
+    async with sessionmanager.read_session() as session:
+        yield session
+
+
+# GET handlers only, see DB_RELEASE_EARLY
+ReadSessionDep = Annotated[AsyncSession, Depends(get_read_db)]
@@ -11,6 +11,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column, class_mapper
 from sqlalchemy import UUID
 
+from app.shared.ids import new_id
+
 
 # https://docs.sqlalchemy.org/en/20/orm/quickstart.html#declare-models
 class Base(DeclarativeBase):
@@ -21,7 +23,7 @@ class HeroModel(Base):
     __tablename__ = "heroes"
 
     id: Mapped[uuid.uuid4] = mapped_column(  # type: ignore
-        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
+        UUID(as_uuid=True), primary_key=True, default=new_id
     )
     name: Mapped[str] = mapped_column(unique=True)
     app_src: Mapped[str] = mapped_column(default="async_app")
@@ -40,7 +42,7 @@ class HeroModel(Base):
     @classmethod
     async def create(cls, db: AsyncSession, id=None, **kwargs):
         if not id:
-            id = uuid.uuid4().hex
+            id = new_id().hex
         app_src = kwargs["source"]
         transaction = cls(id=id, name=kwargs["name"], app_src=app_src)
         db.add(transaction)
@@ -2,6 +2,7 @@ from enum import Enum
 from functools import lru_cache
 from os import environ
 from pathlib import Path
+from typing import Literal
 
 from pydantic import (
     computed_field,
@@ -47,8 +48,19 @@ class AppSettings(BaseSettings):
     POSTGRES_DB: str = str(environ.get("POSTGRES_DB"))
     DB_ECHO: bool = bool(environ.get("DB_ECHO", False))
     BD_POOL_PRE_PING: bool = bool(environ.get("BD_POOL_PRE_PING", True))
+    DB_LIVENESS: Literal["pre_ping", "background"] = environ.get("DB_LIVENESS", "pre_ping")  # type: ignore
+    DB_HEALTH_CHECK_INTERVAL: float = float(environ.get("DB_HEALTH_CHECK_INTERVAL", 30))
+    DB_POOL_RECYCLE: int = int(environ.get("DB_POOL_RECYCLE", 1800))
     BD_EXPIRES_ON_COMMIT: bool = bool(environ.get("BD_EXPIRES_ON_COMMIT", True))
     DB_AUTO_FLUSH: bool = bool(environ.get("DB_AUTO_FLUSH", False))
+    # primary keys of new rows: time ordered uuid7 or random uuid4, see app/shared/ids.py
+    ID_STRATEGY: Literal["uuid7", "uuid4"] = environ.get("ID_STRATEGY", "uuid7")  # type: ignore
+    # read sessions (GET handlers) hand the connection back to the pool right after each
+    # read, instead of holding it until the session closes after the response is serialized
+    DB_RELEASE_EARLY: bool = bool(environ.get("DB_RELEASE_EARLY", False))
+    # count prepared statement cache hits on /metrics, off by default: it reads private
+    # driver state on every statement
+    DB_PREPARED_STATS: bool = bool(environ.get("DB_PREPARED_STATS", False))
     DB: str | None = environ.get("DB", None)
 
     @property
@@ -87,9 +99,10 @@ class AppSettings(BaseSettings):
     def set_engine_args(self) -> dict:
         return {  # engine arguments example
             "echo": self.DB_ECHO,  # print all SQL statements
-            "pool_pre_ping": self.BD_POOL_PRE_PING,  # feature will normally emit SQL equivalent to “SELECT 1” each time a connection is checked out from the pool
+            "pool_pre_ping": self.BD_POOL_PRE_PING and self.DB_LIVENESS == "pre_ping",  # feature will normally emit SQL equivalent to “SELECT 1” each time a connection is checked out from the pool
             "pool_size": self.DB_POOL_SIZE,  # number of connections to keep open at a time
             "max_overflow": self.BD_MAX_CONNECTIONS,  # number of connections to allow to be opened above pool_size
+            "pool_recycle": self.DB_POOL_RECYCLE,  # seconds before a connection is replaced on checkout
         }
 
     @property
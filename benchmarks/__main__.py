@@ -0,0 +1,45 @@
+"""
+Headless load test of the asyncpg, psycopg3 and psycopg2 entry points, driven in-process
+through an ASGI client against a real Postgres (e.g. the docker-compose container).
+
+    python -m benchmarks --host admin:changethis@localhost:5432/load --concurrency 1 10 50
+"""
+import argparse
+import asyncio
+import json
+
+from app.settings import settings
+
+from .harness import APPS, SCENARIOS, run_app
+
+
+async def main(args: argparse.Namespace) -> None:
+    report = []
+    for name in args.apps:
+        report.extend(await run_app(name, settings, args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--host", default="admin:changethis@localhost:5432/load")
+    parser.add_argument("--apps", nargs="+", choices=list(APPS), default=list(APPS))
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS)
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--requests", type=int, default=1000, help="per concurrency level")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--toys", type=int, default=1_000)
+    parser.add_argument("--toys-per-user", type=int, default=3)
+    parser.add_argument("--large-limit", type=int, default=settings.PAGE_MAX_LIMIT)
+    parser.add_argument("--output", help="write the JSON report to a file instead of stdout")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,212 @@
+import asyncio
+import contextlib
+import sys
+import time
+from dataclasses import dataclass, field
+from random import Random
+from typing import Any, Awaitable, Callable
+from uuid import uuid4
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import Engine, Pool, select
+
+from app.application import Application
+from app.async_application import AsyncApp
+from app.async_router import async_router
+from app.router import router
+from app.settings import AppSettings
+from app.shared.async_database import asyncsessionmanager
+from app.shared.database import sessionmanager
+from app.shared.models import ToyModel, UserModel
+
+from .common import StatementCounter, seed, summary
+
+# entry point name -> (url scheme, application factory, router), as in app/*_main.py
+APPS = {
+    "asyncpg": ("postgresql+asyncpg", AsyncApp, async_router),
+    "psycopg3": ("postgresql+psycopg", Application, router),
+    "psycopg2": ("postgresql+psycopg2", Application, router),
+}
+
+
+@dataclass
+class Data:
+    toys: list
+    users: list
+    large_limit: int
+    random: Random = field(default_factory=lambda: Random(42))
+
+
+Operation = Callable[[httpx.AsyncClient, Data], Awaitable[httpx.Response]]
+
+
+async def get_toy(client: httpx.AsyncClient, data: Data) -> httpx.Response:
+    return await client.get(f"/toys/{data.random.choice(data.toys)}")
+
+
+async def get_user(client: httpx.AsyncClient, data: Data) -> httpx.Response:
+    return await client.get(f"/users/{data.random.choice(data.users)}")
+
+
+async def list_toys(client: httpx.AsyncClient, data: Data) -> httpx.Response:
+    return await client.get("/toys")
+
+
+async def list_users(client: httpx.AsyncClient, data: Data) -> httpx.Response:
+    return await client.get("/users")
+
+
+async def list_toys_large(client: httpx.AsyncClient, data: Data) -> httpx.Response:
+    return await client.get("/toys", params={"limit": data.large_limit})
+
+
+async def list_users_large(client: httpx.AsyncClient, data: Data) -> httpx.Response:
+    return await client.get("/users", params={"limit": data.large_limit})
+
+
+async def create_toy(client: httpx.AsyncClient, data: Data) -> httpx.Response:
+    return await client.post("/toys", json={"name": f"bench-{uuid4().hex}"})
+
+
+async def create_user(client: httpx.AsyncClient, data: Data) -> httpx.Response:
+    toys = [str(id) for id in data.random.sample(data.toys, 3)]
+    return await client.post("/users", json={"name": "bench-user", "toys": toys})
+
+
+# weighted operation mixes
+SCENARIOS: dict[str, list[tuple[Operation, int]]] = {
+    "read-heavy": [(get_toy, 45), (get_user, 45), (list_toys, 5), (list_users, 5)],
+    "write-heavy": [(create_toy, 60), (create_user, 30), (get_toy, 10)],
+    "mixed": [
+        (get_toy, 25),
+        (get_user, 25),
+        (list_toys, 10),
+        (list_users, 10),
+        (create_toy, 15),
+        (create_user, 15),
+    ],
+    "large-listings": [(list_toys_large, 50), (list_users_large, 50)],
+}
+
+
+class PoolWaitTimer:
+    """Time spent by checkouts inside the pool, i.e. waiting for a free connection."""
+
+    def __init__(self, pool: Pool):
+        self.pool = pool
+        self.samples: list[float] = []
+        self._do_get = pool._do_get  # type: ignore[attr-defined]
+        pool._do_get = self._timed  # type: ignore[method-assign]
+
+    def _timed(self) -> Any:
+        start = time.perf_counter()
+        try:
+            return self._do_get()
+        finally:
+            self.samples.append(time.perf_counter() - start)
+
+    def reset(self) -> list[float]:
+        samples, self.samples = self.samples, []
+        return samples
+
+    def remove(self) -> None:
+        self.pool._do_get = self._do_get  # type: ignore[method-assign]
+
+
+def build_app(name: str, host: str, settings: AppSettings) -> tuple[FastAPI, Engine]:
+    scheme, factory, app_router = APPS[name]
+    url = f"{scheme}://{host}"
+    app = factory(
+        router=app_router,
+        settings=settings.model_copy(update={"DB": url}),
+        db_url=url,
+        init_db=True,
+    )()
+    if factory is AsyncApp:
+        return app, asyncsessionmanager._engine.sync_engine  # type: ignore[union-attr]
+    return app, sessionmanager._engine  # type: ignore[return-value]
+
+
+async def load_data(name: str, args: Any) -> Data:
+    def prepare(connection) -> tuple[list, list]:
+        seed(connection, args.users, args.toys, args.toys_per_user)
+        toys = connection.scalars(select(ToyModel.id).limit(1000)).all()
+        users = connection.scalars(select(UserModel.id).limit(1000)).all()
+        return list(toys), list(users)
+
+    if APPS[name][1] is AsyncApp:
+        async with asyncsessionmanager._engine.connect() as connection:  # type: ignore[union-attr]
+            toys, users = await connection.run_sync(prepare)
+    else:
+        with sessionmanager._engine.connect() as connection:  # type: ignore[union-attr]
+            toys, users = prepare(connection)
+    return Data(toys=toys, users=users, large_limit=args.large_limit)
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    operations: list[tuple[Operation, int]],
+    data: Data,
+    concurrency: int,
+    requests: int,
+) -> tuple[list[float], int, float]:
+    functions, weights = zip(*operations)
+    # the same request sequence for every app, drained by `concurrency` workers
+    plan = iter(Random(7).choices(functions, weights, k=requests))
+    latencies: list[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for operation in plan:
+            start = time.perf_counter()
+            response = await operation(client, data)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+async def run_app(name: str, settings: AppSettings, args: Any) -> list[dict]:
+    app, engine = build_app(name, args.host, settings)
+    report = []
+    # the lifespan banner would end up in the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        async with app.router.lifespan_context(app):
+            data = await load_data(name, args)
+            counter = StatementCounter(engine)
+            timer = PoolWaitTimer(engine.pool)
+            transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                for scenario in args.scenarios:
+                    operations = SCENARIOS[scenario]
+                    await run_level(client, operations, data, 1, args.warmup)
+                    for concurrency in args.concurrency:
+                        counter.reset()
+                        timer.reset()
+                        latencies, errors, elapsed = await run_level(
+                            client, operations, data, concurrency, args.requests
+                        )
+                        waits = timer.reset()
+                        report.append(
+                            {
+                                "app": name,
+                                "scenario": scenario,
+                                "concurrency": concurrency,
+                                "requests": len(latencies),
+                                "errors": errors,
+                                "throughput_rps": round(len(latencies) / elapsed, 1),
+                                "latency": summary(latencies),
+                                "pool_wait": summary(waits) if waits else None,
+                                "statements_per_request": round(
+                                    counter.reset() / len(latencies), 2
+                                ),
+                            }
+                        )
+            counter.remove()
+            timer.remove()
+    return report
@@ -0,0 +1,107 @@
+"""
+Compare the ORM route against the Core fast path of the toy read endpoints, per driver.
+
+    python -m benchmarks.read_path --host admin:changethis@localhost:5432/load
+"""
+import argparse
+import asyncio
+import json
+from random import choice
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.shared.models import ToyModel
+from app.shared.queries import select_toys, toys_from_rows
+from app.shared.schema import ToyDTO
+
+from .common import measure, measure_sync, seed
+
+ASYNC_DRIVERS = ("asyncpg", "psycopg")
+SYNC_DRIVERS = ("psycopg2",)
+
+
+def orm_list(session: Session, limit: int) -> list[ToyDTO]:
+    return [ToyDTO.model_validate(t) for t in session.scalars(select(ToyModel).limit(limit))]
+
+
+def core_list(session: Session, limit: int) -> list[ToyDTO]:
+    return toys_from_rows(session.execute(select_toys().limit(limit)).all())
+
+
+def orm_get(session: Session, id) -> ToyDTO:
+    return ToyDTO.model_validate(session.get(ToyModel, id))
+
+
+def core_get(session: Session, id) -> ToyDTO:
+    return toys_from_rows(session.execute(select_toys().where(ToyModel.id == id)).all())[0]
+
+
+def scenarios(limit: int, ids: list) -> dict:
+    return {
+        "list/orm": lambda s: orm_list(s, limit),
+        "list/core": lambda s: core_list(s, limit),
+        "get/orm": lambda s: orm_get(s, choice(ids)),
+        "get/core": lambda s: core_get(s, choice(ids)),
+    }
+
+
+async def run_async(url: str, args: argparse.Namespace) -> dict:
+    engine = create_async_engine(url)
+    factory = async_sessionmaker(engine, class_=AsyncSession)
+    async with engine.connect() as connection:
+        await connection.run_sync(seed, 0, args.toys, 0)
+        ids = (await connection.scalars(select(ToyModel.id).limit(1000))).all()
+    report = {}
+    for name, fn in scenarios(args.limit, list(ids)).items():
+
+        async def call():
+            async with factory() as session:
+                # the same sync callables run inside the AsyncSession greenlet
+                return await session.run_sync(fn)
+
+        report[name] = await measure(call, args.repeat)
+    await engine.dispose()
+    return report
+
+
+def run_sync(url: str, args: argparse.Namespace) -> dict:
+    engine = create_engine(url)
+    factory = sessionmaker(engine, class_=Session)
+    with engine.connect() as connection:
+        seed(connection, 0, args.toys, 0)
+        ids = connection.scalars(select(ToyModel.id).limit(1000)).all()
+    report = {}
+    for name, fn in scenarios(args.limit, list(ids)).items():
+
+        def call():
+            with factory() as session:
+                return fn(session)
+
+        report[name] = measure_sync(call, args.repeat)
+    engine.dispose()
+    return report
+
+
+async def main(args: argparse.Namespace) -> None:
+    report = {}
+    for driver in args.drivers:
+        url = f"postgresql+{driver}://{args.host}"
+        if driver in SYNC_DRIVERS:
+            report[driver] = run_sync(url, args)
+        else:
+            report[driver] = await run_async(url, args)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="admin:changethis@localhost:5432/load")
+    parser.add_argument(
+        "--drivers", nargs="+", default=[*ASYNC_DRIVERS, *SYNC_DRIVERS]
+    )
+    parser.add_argument("--toys", type=int, default=10_000)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
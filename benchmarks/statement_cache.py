@@ -0,0 +1,78 @@
+"""
+Effect of the compiled SQL cache and prepared statement settings on GET /toys/{id}.
+
+    python -m benchmarks.statement_cache --host admin:changethis@localhost:5432/load
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import sys
+from random import choice
+
+import httpx
+
+from app.settings import settings
+from app.shared.telemetry import telemetry
+
+from .common import measure
+from .harness import APPS, build_app, load_data
+
+CONFIGS = {
+    "default": {},
+    "no-compiled-cache": {"DB_QUERY_CACHE_SIZE": 0},
+    "no-prepared-cache": {"DB_PREPARED_CACHE_SIZE": 0, "DB_PREPARE_THRESHOLD": -1},
+    "prepare-first-run": {"DB_PREPARE_THRESHOLD": 0},
+    "pgbouncer-unique-names": {"DB_PGBOUNCER_MODE": "unique_names"},
+    "pgbouncer-no-cache": {"DB_PGBOUNCER_MODE": "no_cache"},
+}
+
+
+async def run(name: str, config: str, args: argparse.Namespace) -> dict:
+    update = {**CONFIGS[config], "DB_PREPARED_STATS": True}
+    app, engine = build_app(name, args.host, settings.model_copy(update=update))
+    with contextlib.redirect_stdout(sys.stderr):
+        async with app.router.lifespan_context(app):
+            data = await load_data(name, args)
+            transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+                async def call():
+                    response = await client.get(f"/toys/{choice(data.toys)}")
+                    response.raise_for_status()
+
+                for _ in range(args.warmup):
+                    await call()
+                caches = telemetry.caches[engine.url.drivername]
+                for counts in (caches.compiled, caches.prepared):
+                    counts.update(dict.fromkeys(counts, 0))
+                latency = await measure(call, args.repeat)
+    return {
+        "app": name,
+        "config": config,
+        "latency": latency,
+        "compiled_cache": dict(caches.compiled),
+        "prepared_cache": dict(caches.prepared),
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    report = []
+    for name in args.apps:
+        for config in args.configs:
+            report.append(await run(name, config, args))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="admin:changethis@localhost:5432/load")
+    parser.add_argument("--apps", nargs="+", choices=list(APPS), default=["asyncpg", "psycopg3"])
+    parser.add_argument("--configs", nargs="+", choices=list(CONFIGS), default=list(CONFIGS))
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--users", type=int, default=0)
+    parser.add_argument("--toys", type=int, default=1000)
+    parser.add_argument("--toys-per-user", type=int, default=0)
+    parser.add_argument("--large-limit", type=int, default=settings.PAGE_MAX_LIMIT)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,79 @@
+"""
+Compare commit + refresh against flush with eager defaults on the ORM create path, per driver.
+
+    python -m benchmarks.write_path --host admin:changethis@localhost:5432/load
+"""
+import argparse
+import asyncio
+import json
+from random import sample
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.shared.models import ToyModel, UserModel
+from app.shared.schema import UserDTO
+
+from .common import StatementCounter, measure, seed
+
+DRIVERS = ("asyncpg", "psycopg")
+
+
+async def create_refresh(session: AsyncSession, ids: list) -> UserDTO:
+    toys = (await session.scalars(select(ToyModel).where(ToyModel.id.in_(ids)))).all()
+    user = UserModel(name="bench-write", toys=toys)
+    session.add(user)
+    await session.commit()
+    await session.refresh(user)
+    return UserDTO.model_validate(user)
+
+
+async def create_flush(session: AsyncSession, ids: list) -> UserDTO:
+    toys = (await session.scalars(select(ToyModel).where(ToyModel.id.in_(ids)))).all()
+    user = UserModel(name="bench-write", toys=toys)
+    session.add(user)
+    await session.flush()
+    dto = UserDTO.model_validate(user)
+    await session.commit()
+    return dto
+
+
+async def run(url: str, args: argparse.Namespace) -> dict:
+    engine = create_async_engine(url)
+    # expire_on_commit as in BD_EXPIRES_ON_COMMIT, which is what forced the refresh
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=True)
+    async with engine.connect() as connection:
+        await connection.run_sync(seed, 0, args.toys, 0)
+        toy_ids = (await connection.scalars(select(ToyModel.id).limit(args.toys))).all()
+    counter = StatementCounter(engine.sync_engine)
+    report = {}
+    for name, create in (("refresh", create_refresh), ("flush", create_flush)):
+
+        async def call():
+            async with factory() as session:
+                return await create(session, sample(toy_ids, args.toys_per_user))
+
+        counter.reset()
+        await call()
+        statements = counter.reset()
+        report[name] = {"statements": statements, **await measure(call, args.repeat)}
+    counter.remove()
+    await engine.dispose()
+    return report
+
+
+async def main(args: argparse.Namespace) -> None:
+    report = {}
+    for driver in args.drivers:
+        report[driver] = await run(f"postgresql+{driver}://{args.host}", args)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="admin:changethis@localhost:5432/load")
+    parser.add_argument("--drivers", nargs="+", default=list(DRIVERS))
+    parser.add_argument("--toys", type=int, default=200)
+    parser.add_argument("--toys-per-user", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
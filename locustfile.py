@@ -8,15 +8,23 @@ class LoadTest(HttpUser):
     toy_data = {}
     wait_time = between(1, 5)
 
+    def get_pages(self, path: str, pages: int = 2):
+        # keyset pagination: the first page, then the ones after its `next` cursor
+        params = {}
+        for _ in range(pages):
+            page = self.client.get(path, params=params, name=path).json()
+            print(page["items"])
+            if page["next"] is None:
+                break
+            params = {"after": page["next"]}
+
     @task(100)
     def get_toys(self):
-        response = self.client.get("/toys")
-        print(response.json())
+        self.get_pages("/toys")
 
     @task(100)
     def get_users(self):
-        response = self.client.get("/users")
-        print(response.json())
+        self.get_pages("/users")
 
     @task(50)
     def create_toys(self):
@@ -0,0 +1,66 @@
+import unittest
+from uuid import uuid4
+
+from app.shared.cache import LocalCache, ToyCache
+from app.shared.schema import ToyDTO
+from app.shared.telemetry import telemetry
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class LocalCacheTest(unittest.IsolatedAsyncioTestCase):
+    async def test_entries_expire_after_their_ttl(self):
+        clock = Clock()
+        cache = LocalCache(maxsize=10, ttl=5, clock=clock)
+        await cache.set("a", 1)
+
+        clock.now = 5
+        self.assertEqual(await cache.get("a"), 1)
+        clock.now = 5.1
+        self.assertIsNone(await cache.get("a"))
+        self.assertEqual(cache.stats(), {"size": 0, "hits": 1, "misses": 1, "evictions": 0})
+
+    async def test_least_recently_used_entry_is_evicted(self):
+        cache = LocalCache(maxsize=2, ttl=60, clock=Clock())
+        await cache.set("a", 1)
+        await cache.set("b", 2)
+        await cache.get("a")
+        await cache.set("c", 3)
+
+        self.assertIsNone(await cache.get("b"))
+        self.assertEqual(await cache.get("a"), 1)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+
+class ToyCacheTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.toycache = ToyCache()
+        self.toycache.init(LocalCache(maxsize=10, ttl=60, clock=Clock()))
+
+    async def asyncTearDown(self):
+        self.toycache.close()
+
+    async def test_put_toy_is_found_by_id_and_name(self):
+        toy = ToyDTO(id=uuid4(), name="ball")
+        await self.toycache.put(toy)
+
+        self.assertEqual(await self.toycache.by_id(toy.id), toy)
+        self.assertEqual(await self.toycache.by_name("ball"), toy)
+        self.assertIsNone(await self.toycache.by_name("kite"))
+
+    async def test_counters_are_published_on_metrics(self):
+        await self.toycache.by_name("kite")
+
+        metrics = telemetry.render()
+        self.assertIn('toy_cache_total{result="miss"} 1', metrics)
+        self.assertIn("toy_cache_size 0", metrics)
+
+
+if __name__ == "__main__":
+    unittest.main()
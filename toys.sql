@@ -1,8 +1,27 @@
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 
+-- UUID versão 7 (RFC 9562): milissegundos unix nos primeiros 48 bits, o resto aleatório.
+-- Chaves em ordem de tempo entram sempre no fim do índice B-tree da chave primária.
+CREATE OR REPLACE FUNCTION uuid_generate_v7() RETURNS uuid AS $$
+    SELECT encode(
+        set_bit(
+            set_bit(
+                overlay(
+                    uuid_send(gen_random_uuid())
+                    PLACING substring(int8send((extract(epoch FROM clock_timestamp()) * 1000)::bigint) FROM 3)
+                    FROM 1 FOR 6
+                ),
+                52, 1
+            ),
+            53, 1
+        ),
+        'hex'
+    )::uuid
+$$ LANGUAGE sql VOLATILE;
+
 -- Criação da tabela 'users'
 CREATE TABLE IF NOT EXISTS users (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4() UNIQUE,
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v7() UNIQUE,
     name VARCHAR(255) NOT NULL,
     created_at TIMESTAMP DEFAULT NOW(),
     updated_on TIMESTAMP DEFAULT NOW()
@@ -10,7 +29,7 @@ CREATE TABLE IF NOT EXISTS users (
 
 -- Criação da tabela 'toys'
 CREATE TABLE IF NOT EXISTS toys (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4() UNIQUE,
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v7() UNIQUE,
     name VARCHAR(255) NOT NULL,
     created_at TIMESTAMP DEFAULT NOW(),
     updated_on TIMESTAMP DEFAULT NOW()
@@ -21,4 +40,28 @@ CREATE TABLE IF NOT EXISTS user_toy (
     users_id UUID REFERENCES users(id),
     toys_id UUID REFERENCES toys(id),
     PRIMARY KEY (users_id, toys_id)
-);
\ No newline at end of file
+);
+
+-- Índices usados pela paginação por cursor (keyset) em GET /toys e GET /users
+CREATE INDEX IF NOT EXISTS ix_users_created_at_id ON users (created_at, id);
+CREATE INDEX IF NOT EXISTS ix_toys_created_at_id ON toys (created_at, id);
+
+-- Alvo do upsert (INSERT ... ON CONFLICT) em POST /toys
+CREATE UNIQUE INDEX IF NOT EXISTS ix_toys_name ON toys (name);
+
+-- Busca das associações por brinquedo; a chave primária atende às buscas por usuário
+CREATE INDEX IF NOT EXISTS ix_user_toy_toys_id ON user_toy (toys_id, users_id);
+
+-- Agregados de GET /stats, atualizados com REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE MATERIALIZED VIEW IF NOT EXISTS toy_popularity AS
+SELECT toys.id AS toy_id, toys.name, count(user_toy.users_id) AS owners
+FROM toys LEFT JOIN user_toy ON user_toy.toys_id = toys.id
+GROUP BY toys.id, toys.name;
+CREATE UNIQUE INDEX IF NOT EXISTS ix_toy_popularity_toy_id ON toy_popularity (toy_id);
+CREATE INDEX IF NOT EXISTS ix_toy_popularity_owners ON toy_popularity (owners DESC, toy_id);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS user_toy_counts AS
+SELECT users.id AS user_id, count(user_toy.toys_id) AS toys
+FROM users LEFT JOIN user_toy ON user_toy.users_id = users.id
+GROUP BY users.id;
+CREATE UNIQUE INDEX IF NOT EXISTS ix_user_toy_counts_user_id ON user_toy_counts (user_id);